@@ -3,7 +3,30 @@ from rest_framework import viewsets
 from .permissions import AuthorOrReadOnly
 
 
-class CreateUpdateDeleteViewSet(viewsets.ModelViewSet):
+class RateLimitHeadersMixin:
+    """Заголовки RateLimit-* по самой строгой корзине запроса."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        rate_limit = getattr(request._request, 'rate_limit', None)
+        if rate_limit is not None:
+            limit, remaining, reset = rate_limit
+            response['RateLimit-Limit'] = limit
+            response['RateLimit-Remaining'] = remaining
+            response['RateLimit-Reset'] = reset
+        return response
+
+
+class CachedListMixin:
+    """Списки берутся из кеша результатов запросов."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.cached() if self.action == 'list' else queryset
+
+
+class CreateUpdateDeleteViewSet(RateLimitHeadersMixin, viewsets.ModelViewSet):
     permission_classes = (AuthorOrReadOnly,)
 
     def perform_create(self, serializer):
@@ -1,19 +1,93 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import models
 from rest_framework import serializers
 
-from posts.models import Comment, Follow, Group, Post
+from core.uploads import too_large_error
+from posts import images
+from posts.forms import UploadedImageField
+from posts.models import Comment, Follow, Group, ImageUpload, Post
 
 User = get_user_model()
 
 
+class ImageField(serializers.ImageField):
+    """ImageField с проверкой картинки по заголовку."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('_DjangoImageField', UploadedImageField)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        error = getattr(data, 'upload_error', None)
+        if error is not None:
+            raise serializers.ValidationError(error)
+        return super().to_internal_value(data)
+
+
 class PostSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: ImageField,
+    }
+
     author = serializers.SlugRelatedField(slug_field='username',
                                           read_only=True)
+    upload = serializers.PrimaryKeyRelatedField(
+        queryset=ImageUpload.objects.all(), write_only=True, required=False,
+        help_text='Завершённая загрузка частями вместо поля image')
 
     class Meta:
-        fields = '__all__'
+        exclude = ('version',)
+        read_only_fields = ('image_width', 'image_height',
+                            'image_placeholder', 'image_color')
         model = Post
 
+    def validate_image(self, value):
+        return images.normalize(value) if value else value
+
+    def validate_upload(self, value):
+        if value.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Загрузка не найдена')
+        if not value.complete:
+            raise serializers.ValidationError('Загрузка не завершена')
+        return value
+
+    def validate(self, attrs):
+        upload = attrs.get('upload')
+        if upload is not None:
+            with File(open(upload.path, 'rb'), upload.filename) as image:
+                try:
+                    images.check_image(image)
+                    attrs['image'] = images.normalize(image)
+                except ValidationError as error:
+                    raise serializers.ValidationError(
+                        {'upload': error.messages})
+        return attrs
+
+    def save(self, **kwargs):
+        upload = self.validated_data.pop('upload', None)
+        post = super().save(**kwargs)
+        if upload is not None:
+            upload.delete()
+        return post
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        fields = ('id', 'filename', 'size', 'offset')
+        read_only_fields = ('offset',)
+        model = ImageUpload
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(too_large_error())
+        if not value:
+            raise serializers.ValidationError('Файл пуст')
+        return value
+
 
 class GroupSerializer(serializers.ModelSerializer):
     class Meta:
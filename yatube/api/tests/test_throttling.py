@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from .. import throttling
+
+User = get_user_model()
+
+RATES = {
+    **api_settings.DEFAULT_THROTTLE_RATES,
+    'read': '3/min',
+    'write': '2/min',
+}
+
+
+class BucketStoreTest(SimpleTestCase):
+    def setUp(self):
+        throttling.reset()
+        cache.clear()
+
+    def test_gcra_allows_burst_then_refills(self):
+        """Корзина пропускает limit запросов подряд и пополняется"""
+        tat = None
+        for remaining in (2, 1, 0):
+            allowed, tat, left, _, _ = throttling.gcra(tat, 100, 3, 60)
+            self.assertTrue(allowed)
+            self.assertEqual(left, remaining)
+        allowed, tat, _, _, wait = throttling.gcra(tat, 100, 3, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20)
+        allowed, *_ = throttling.gcra(tat, 120, 3, 60)
+        self.assertTrue(allowed)
+
+    def test_cache_store_shares_buckets(self):
+        """Хранилища в кеше видят одну и ту же корзину"""
+        first = throttling.CacheBucketStore(cache,
+                                            throttling.LocalBucketStore())
+        second = throttling.CacheBucketStore(cache,
+                                             throttling.LocalBucketStore())
+        self.assertTrue(first.consume('key', 2, 60)[0])
+        self.assertTrue(second.consume('key', 2, 60)[0])
+        self.assertFalse(first.consume('key', 2, 60)[0])
+
+    def test_cache_store_falls_back_when_locked(self):
+        """Без блокировки в кеше используется хранилище процесса"""
+        fallback = throttling.LocalBucketStore()
+        store = throttling.CacheBucketStore(cache, fallback)
+        cache.set('key:lock', 1)
+        store.consume('key', 2, 60)
+        self.assertIn('key', fallback._tats)
+        self.assertIsNone(cache.get('key'))
+
+
+@override_settings(REST_FRAMEWORK={
+    **api_settings.user_settings,
+    'DEFAULT_THROTTLE_RATES': RATES,
+})
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        throttling.reset()
+        self.user = User.objects.create_user(username='user')
+
+    def test_rate_limit_headers(self):
+        """Ответ API содержит заголовки RateLimit-*"""
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response['RateLimit-Limit'], '3')
+        self.assertEqual(response['RateLimit-Remaining'], '2')
+        self.assertEqual(response['RateLimit-Reset'], '20')
+
+    def test_too_many_requests(self):
+        """Сверх лимита API отвечает 429 с Retry-After"""
+        for _ in range(3):
+            self.client.get('/api/v1/groups/')
+        response = self.client.get('/api/v1/groups/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_forwarded_for_does_not_reset_ip_bucket(self):
+        """Подмена X-Forwarded-For не даёт новую корзину IP"""
+        for number in range(3):
+            self.client.get('/api/v1/groups/',
+                            HTTP_X_FORWARDED_FOR=f'10.0.0.{number}')
+        response = self.client.get('/api/v1/groups/',
+                                   HTTP_X_FORWARDED_FOR='10.0.0.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_endpoint_classes_are_separate(self):
+        """Запись и чтение расходуют разные корзины"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for _ in range(2):
+            response = client.post('/api/v1/posts/', {'text': 'Текст'})
+            self.assertEqual(response.status_code, 201)
+        response = client.post('/api/v1/posts/', {'text': 'Текст'})
+        self.assertEqual(response.status_code, 429)
+        response = client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
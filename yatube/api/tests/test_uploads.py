@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from posts.models import ImageUpload, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_UPLOAD_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(size=(300, 200)):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(output, 'JPEG')
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   CHUNKED_UPLOAD_DIR=TEMP_UPLOAD_DIR)
+class ChunkedUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.data = make_image()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_UPLOAD_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, size=None):
+        response = self.client.post('/api/v1/uploads/', {
+            'filename': 'photo.jpg', 'size': size or len(self.data),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f'/api/v1/uploads/{response.data["id"]}/'
+
+    def send(self, url, offset, chunk):
+        return self.client.generic(
+            'PATCH', url, chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resumed_upload_creates_post(self):
+        """Части дописываются по смещению, загрузка становится картинкой"""
+        url = self.start()
+        middle = len(self.data) // 2
+        response = self.send(url, 0, self.data[:middle])
+        self.assertEqual(response['Upload-Offset'], str(middle))
+        # Повтор уже принятой части после обрыва не ломает файл.
+        response = self.send(url, 0, self.data[:middle])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.head(url)['Upload-Offset'],
+                         str(middle))
+        response = self.send(url, middle, self.data[middle:])
+        self.assertEqual(response.data['offset'], len(self.data))
+        upload = ImageUpload.objects.get()
+        response = self.client.post('/api/v1/posts/', {
+            'text': 'Частями', 'upload': str(upload.pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['image_width'], 300)
+        post = Post.objects.get(text='Частями')
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_incomplete_or_foreign_upload_rejected(self):
+        """Незавершённую или чужую загрузку нельзя прикрепить к посту"""
+        url = self.start()
+        self.send(url, 0, self.data[:10])
+        upload = ImageUpload.objects.get()
+        response = self.client.post('/api/v1/posts/', {
+            'text': 'Рано', 'upload': str(upload.pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other'))
+        self.assertEqual(other.get(url).status_code, 404)
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_size_limits(self):
+        """Размер загрузки и выход части за конец файла проверяются"""
+        response = self.client.post('/api/v1/uploads/', {
+            'filename': 'big.jpg', 'size': 101}, format='json')
+        self.assertEqual(response.status_code, 400)
+        url = self.start(size=50)
+        self.assertEqual(self.send(url, 0, b'x' * 60).status_code, 400)
+
+    def test_not_image_rejected(self):
+        """Завершённая загрузка проверяется как картинка"""
+        url = self.start(size=10)
+        self.send(url, 0, b'not image!')
+        response = self.client.post('/api/v1/posts/', {
+            'text': 'Не картинка',
+            'upload': str(ImageUpload.objects.get().pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('upload', response.data)
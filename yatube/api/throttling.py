@@ -0,0 +1,172 @@
+"""Token bucket для API в форме GCRA.
+
+Состояние корзины — одно число: момент, когда она снова станет полной
+(TAT). Корзины хранятся в кеше RATE_LIMIT_CACHE, чтение и запись
+которого защищены блокировкой через атомарный cache.add. Если кеш
+локальный для процесса или блокировку взять не удалось, используется
+хранилище в памяти процесса.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+
+THROTTLED = metrics.Counter(
+    'api_throttled_total',
+    'Запросы к API, отклонённые ограничением частоты',
+    ('scope',),
+)
+
+
+def gcra(tat, now, limit, duration):
+    """Решение по корзине: (пропустить, новый TAT, осталось, сброс, ждать)"""
+    interval = duration / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - duration
+    if now < allow_at:
+        return False, tat, 0, tat - now, allow_at - now
+    remaining = int((now - allow_at) / interval)
+    return True, new_tat, remaining, new_tat - now, 0
+
+
+class LocalBucketStore:
+    """Корзины в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def consume(self, key, limit, duration):
+        now = time.time()
+        with self._lock:
+            allowed, tat, *rest = gcra(self._tats.get(key), now,
+                                       limit, duration)
+            self._tats[key] = tat
+            if len(self._tats) > settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+                self._tats = {key: value for key, value
+                              in self._tats.items() if value > now}
+        return (allowed, *rest)
+
+
+class CacheBucketStore:
+    """Корзины в общем кеше, общие для всех процессов."""
+
+    lock_attempts = 3
+
+    def __init__(self, cache, fallback):
+        self.cache = cache
+        self.fallback = fallback
+
+    def consume(self, key, limit, duration):
+        lock_key = f'{key}:lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, 1):
+                try:
+                    now = time.time()
+                    allowed, tat, *rest = gcra(self.cache.get(key), now,
+                                               limit, duration)
+                    self.cache.set(key, tat, math.ceil(tat - now) + 1)
+                    return (allowed, *rest)
+                finally:
+                    self.cache.delete(lock_key)
+            time.sleep(0.001)
+        return self.fallback.consume(key, limit, duration)
+
+
+_local_store = LocalBucketStore()
+
+
+def reset():
+    with _local_store._lock:
+        _local_store._tats.clear()
+
+
+def get_store():
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    if isinstance(cache, LocMemCache):
+        return _local_store
+    return CacheBucketStore(cache, _local_store)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Базовый класс: ключ корзины задаёт get_cache_key.
+
+    Итог самой строгой корзины запроса сохраняется
+    в request.rate_limit для заголовков RateLimit-*.
+    """
+
+    cache_format = 'rate-limit:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        allowed, remaining, reset, self.retry_after = get_store().consume(
+            key, self.num_requests, self.duration)
+        current = getattr(request._request, 'rate_limit', None)
+        if current is None or remaining < current[1]:
+            request._request.rate_limit = (self.num_requests, remaining,
+                                           math.ceil(reset))
+        if not allowed:
+            THROTTLED.inc(scope=self.scope)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope,
+                                    'ident': request.user.pk}
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    scope = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope,
+                                    'ident': self.get_ident(request)}
+
+
+class EndpointClassRateThrottle(TokenBucketThrottle):
+    """Корзина пользователя или IP для класса эндпоинтов: read или write.
+
+    Класс можно переопределить атрибутом throttle_scope у view.
+    """
+
+    # Уточняется по запросу в allow_request.
+    scope = 'read'
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None) or (
+            'read' if request.method in ('GET', 'HEAD', 'OPTIONS')
+            else 'write')
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (CommentViewSet,
                     FollowViewSet,
                     GroupViewSet,
+                    ImageUploadViewSet,
                     PostViewSet)
 
 app_name = 'api'
@@ -15,6 +16,7 @@ router.register(r'posts/(?P<post_id>[0-9]+)/comments',
                 CommentViewSet,
                 basename='comments')
 router.register(r'follow', FollowViewSet, basename='follow')
+router.register(r'uploads', ImageUploadViewSet, basename='uploads')
 
 urlpatterns = [
     path('v1/', include('djoser.urls')),
@@ -1,23 +1,33 @@
-from django.shortcuts import get_object_or_404
-from rest_framework import filters, viewsets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from .mixins import CreateUpdateDeleteViewSet
-from posts.models import Comment, Follow, Group, Post
+from core.object_cache import get_cached_or_404
+from .mixins import (CachedListMixin, CreateUpdateDeleteViewSet,
+                     RateLimitHeadersMixin)
+from posts.models import Comment, Follow, Group, ImageUpload, Post
 from .serializers import (CommentSerializer,
                           FollowSerializer,
                           GroupSerializer,
+                          ImageUploadSerializer,
                           PostSerializer)
 
 
-class PostViewSet(CreateUpdateDeleteViewSet):
+class PostViewSet(CachedListMixin, CreateUpdateDeleteViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     pagination_class = LimitOffsetPagination
 
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+class GroupViewSet(CachedListMixin, RateLimitHeadersMixin,
+                   viewsets.ReadOnlyModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
 
@@ -26,7 +36,8 @@ class CommentViewSet(CreateUpdateDeleteViewSet):
     serializer_class = CommentSerializer
 
     def get_queryset(self):
-        post = get_object_or_404(Post, pk=self.kwargs.get('post_id'))
+        post = get_cached_or_404(Post.objects,
+                                 pk=self.kwargs.get('post_id'))
         comments = Comment.objects.filter(post=post.id)
         return comments
 
@@ -42,3 +53,62 @@ class FollowViewSet(CreateUpdateDeleteViewSet):
 
     def get_queryset(self):
         return Follow.objects.filter(user=self.request.user)
+
+
+class ImageUploadViewSet(RateLimitHeadersMixin,
+                         mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """Загрузка картинки поста частями с продолжением после обрыва.
+
+    POST создаёт загрузку с именем и размером файла, PATCH с заголовком
+    Upload-Offset дописывает тело запроса, GET или HEAD возвращают,
+    сколько байт уже принято. Завершённая загрузка передаётся в поле
+    upload при создании поста.
+    """
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'uploads'
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        expired = timezone.now() - timedelta(
+            seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+        for upload in ImageUpload.objects.filter(created__lt=expired):
+            upload.delete()
+        serializer.save(user=self.request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        data = getattr(response, 'data', None)
+        if (not response.exception and isinstance(data, dict)
+                and 'offset' in data):
+            response['Upload-Offset'] = data['offset']
+        return response
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {'offset': 'Нужны заголовки Upload-Offset и Content-Length'})
+        if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+            raise ValidationError({'offset': 'Слишком большая часть'})
+        if offset + length > upload.size:
+            raise ValidationError({'offset': 'Часть выходит за конец файла'})
+        with transaction.atomic():
+            upload = ImageUpload.objects.select_for_update().get(
+                pk=upload.pk)
+            if offset != upload.offset:
+                return Response(self.get_serializer(upload).data,
+                                status=status.HTTP_409_CONFLICT)
+            # Тело читается из потока частями, без request.data.
+            upload.offset += upload.append(request.stream, length)
+            upload.save(update_fields=['offset'])
+        return Response(self.get_serializer(upload).data)
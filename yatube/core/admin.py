@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import SlowQuery
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('sql',
+                    'count',
+                    'total_time',
+                    'max_time',
+                    'view',
+                    'location',
+                    'last_seen')
+    list_filter = ('view',)
+    search_fields = ('sql',)
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,119 @@
+"""Ограничение числа одновременных запросов по классам маршрутов."""
+import threading
+
+from django.conf import settings
+
+from core import metrics
+
+IN_FLIGHT = metrics.Gauge(
+    'admission_in_flight',
+    'Запросы, выполняемые сейчас, по классам маршрутов',
+    ('route_class',),
+)
+REQUESTS = metrics.Counter(
+    'admission_requests_total',
+    'Решения контроля допуска: admitted, queued или shed',
+    ('route_class', 'result'),
+)
+
+
+class Gate:
+    """Не больше limit запросов сразу и не больше queue_size в очереди.
+
+    Приоритетные запросы ждут в своей очереди длиной priority_queue_size
+    (по умолчанию queue_size) и входят раньше обычных, когда
+    освобождается место.
+    """
+
+    def __init__(self, name, limit, queue_size, timeout,
+                 priority_queue_size=None):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.priority_queue_size = (queue_size if priority_queue_size is None
+                                    else priority_queue_size)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.waiting_priority = 0
+        self._condition = threading.Condition()
+
+    def _can_enter(self, priority):
+        if self.in_flight >= self.limit:
+            return False
+        return priority or not self.waiting_priority
+
+    def acquire(self, priority=False):
+        with self._condition:
+            if self._can_enter(priority):
+                self.in_flight += 1
+                result = 'admitted'
+            elif self._queue_full(priority):
+                result = 'shed'
+            else:
+                result = self._wait(priority)
+        REQUESTS.inc(route_class=self.name, result=result)
+        if result == 'shed':
+            return False
+        IN_FLIGHT.inc(route_class=self.name)
+        return True
+
+    def _queue_full(self, priority):
+        if priority:
+            return self.waiting_priority >= self.priority_queue_size
+        return self.waiting >= self.queue_size
+
+    def _wait(self, priority):
+        # waiting — обычные запросы в очереди, waiting_priority — приоритетные.
+        self.waiting += not priority
+        self.waiting_priority += priority
+        try:
+            if not self._condition.wait_for(
+                    lambda: self._can_enter(priority), self.timeout):
+                return 'shed'
+            self.in_flight += 1
+            return 'queued'
+        finally:
+            self.waiting -= not priority
+            self.waiting_priority -= priority
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+        IN_FLIGHT.dec(route_class=self.name)
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(name):
+    with _gates_lock:
+        if name not in _gates:
+            options = settings.ADMISSION_CLASSES[name]
+            _gates[name] = Gate(name, options['limit'], options['queue'],
+                                options['timeout'],
+                                options.get('priority_queue'))
+        return _gates[name]
+
+
+def reset():
+    with _gates_lock:
+        _gates.clear()
+
+
+def classify(request, view_name):
+    """Класс маршрута запроса или None, если запрос не ограничивается."""
+    if request.path_info.startswith((settings.STATIC_URL,
+                                     settings.MEDIA_URL)):
+        return 'static'
+    if view_name in settings.ADMISSION_EXEMPT_VIEWS:
+        return None
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return 'writes'
+    if view_name.startswith('api:'):
+        return 'api'
+    if view_name in settings.ADMISSION_FEED_VIEWS:
+        return 'feeds'
+    return None
@@ -0,0 +1,121 @@
+"""Async view поверх синхронного обработчика Django 2.2.
+
+Django 2.2 вызывает view синхронно, поэтому async_view оборачивает
+корутину в async_to_sync. Под ASGI корутина выполняется в event loop
+сервера, а независимые запросы к БД, переданные в gather, идут
+одновременно в отдельном пуле из ASYNC_VIEWS_WORKERS потоков, каждый
+со своим соединением. Под WSGI для корутины создаётся свой event loop,
+поведение то же.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from core import instrumentation
+
+_lock = threading.Lock()
+_executor = None
+# Состояние потока запроса: корутина view выполняется в другом потоке.
+_request = contextvars.ContextVar('asyncviews_request', default=None)
+RequestState = namedtuple('RequestState', 'parallel stats wrappers')
+
+
+def async_view(view):
+    """Синхронная точка входа для async def view(request, ...)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _request.set(RequestState(
+            parallel(), instrumentation.current(), _request_wrappers()))
+        try:
+            return async_to_sync(view)(request, *args, **kwargs)
+        finally:
+            _request.reset(token)
+    return wrapper
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEWS_WORKERS,
+                thread_name_prefix='async-views')
+        return _executor
+
+
+def parallel():
+    """Можно ли выполнять запросы в других соединениях.
+
+    Внутри транзакции (ATOMIC_REQUESTS, TestCase) другие соединения не
+    видят её изменений, а SQLite в памяти живёт в одном соединении —
+    тогда всё выполняется в потоке запроса по очереди.
+    """
+    for connection in connections.all():
+        if connection.in_atomic_block:
+            return False
+        is_in_memory_db = getattr(connection, 'is_in_memory_db', None)
+        if is_in_memory_db is not None and is_in_memory_db():
+            return False
+    return True
+
+
+def _request_wrappers():
+    return {connection.alias: list(connection.execute_wrappers)
+            for connection in connections.all()}
+
+
+def _reuse_connections():
+    """Как close_old_connections, но без CONN_MAX_AGE.
+
+    У потоков пула нет запросов, после которых соединение закрывалось
+    бы по CONN_MAX_AGE, поэтому они постоянные и закрываются, только
+    если стали непригодны после ошибки.
+    """
+    for connection in connections.all():
+        connection.close_at = None
+        connection.close_if_unusable_or_obsolete()
+
+
+def _call(func, stats, wrappers):
+    _reuse_connections()
+    with ExitStack() as stack:
+        # Обёртки замеров запроса действуют и на соединения пула.
+        for connection in connections.all():
+            for wrapper in wrappers.get(connection.alias, ()):
+                if wrapper not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+        if stats is not None:
+            stack.enter_context(instrumentation.attach(stats))
+        return func()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронный func вне event loop."""
+    call = functools.partial(func, *args, **kwargs)
+    state = _request.get()
+    if state is None or not state.parallel:
+        return await sync_to_async(call)()
+    return await sync_to_async(
+        _call, thread_sensitive=False, executor=_get_executor())(
+        call, state.stats, state.wrappers)
+
+
+async def gather(*calls):
+    """Выполняет независимые вызовы одновременно; их результаты.
+
+    Вызов — функция без аргументов, например lambda или partial.
+    """
+    state = _request.get()
+    if state is None or not state.parallel:
+        # asgiref возвращает в поток запроса только задачу самой view,
+        # поэтому без пула вызовы идут из неё по очереди.
+        return [await run(call) for call in calls]
+    return await asyncio.gather(*(run(call) for call in calls))
@@ -0,0 +1,46 @@
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from core import codecs, instrumentation
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Отмечает попадания и промахи кеша в счётчиках запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        instrumentation.record_cache(value is not _MISSING)
+        return default if value is _MISSING else value
+
+
+class CodecCacheMixin:
+    """Хранит значения, закодированные кодеком из OPTIONS['CODEC'].
+
+    Целые числа хранятся как есть, чтобы работали incr и decr.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.codec = codecs.get_codec(params.get('OPTIONS', {}))
+
+    def _encode(self, value):
+        return value if type(value) is int else self.codec.encode(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return super().add(key, self._encode(value), timeout, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, self._encode(value), timeout, version)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        return value if type(value) is int else self.codec.decode(value)
+
+
+class LocMemCache(InstrumentedCacheMixin, CodecCacheMixin,
+                  locmem.LocMemCache):
+    pass
@@ -0,0 +1,83 @@
+"""Предохранитель для обращений к БД из читающих view."""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core import metrics
+
+CIRCUIT_OPEN = metrics.Gauge(
+    'db_circuit_open',
+    'Предохранитель БД разомкнут (1) или замкнут (0)',
+)
+
+
+def probe_database():
+    """Пробный запрос: БД отвечает и отвечает быстро."""
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return time.perf_counter() - started < settings.DB_BREAKER_SLOW_QUERY
+
+
+class CircuitBreaker:
+    """Размыкается после DB_BREAKER_FAILURE_THRESHOLD неудач подряд.
+
+    Через DB_BREAKER_COOLDOWN секунд один поток выполняет пробный
+    запрос: при успехе предохранитель замыкается, иначе снова
+    размыкается на тот же срок.
+    """
+
+    def __init__(self, probe=probe_database):
+        self.probe = probe
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = None
+            self._probing = False
+        CIRCUIT_OPEN.set(0)
+
+    @property
+    def is_open(self):
+        return self._open_until is not None
+
+    def allow(self):
+        """Можно ли сейчас обращаться к БД."""
+        with self._lock:
+            if self._open_until is None:
+                return True
+            if self._probing or time.time() < self._open_until:
+                return False
+            self._probing = True
+        try:
+            healthy = self.probe()
+        except Exception:
+            healthy = False
+        with self._lock:
+            self._probing = False
+            if healthy:
+                self._failures = 0
+                self._open_until = None
+            else:
+                self._open_until = time.time() + settings.DB_BREAKER_COOLDOWN
+        CIRCUIT_OPEN.set(0 if healthy else 1)
+        return healthy
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures < settings.DB_BREAKER_FAILURE_THRESHOLD:
+                return
+            self._open_until = time.time() + settings.DB_BREAKER_COOLDOWN
+        CIRCUIT_OPEN.set(1)
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,108 @@
+"""Защита дорогих пересчётов кеша от одновременного промаха.
+
+get_or_compute хранит вместе со значением момент устаревания и время
+расчёта. Пересчёт начинается немного раньше срока с вероятностью,
+растущей к концу срока (XFetch), и выполняется одним исполнителем:
+остальные в это время получают устаревшее значение или ждут нового.
+"""
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+FILLS = metrics.Counter(
+    'cache_fill_total',
+    'Обращения к кешу с защитой от пересчётов: fresh, early, '
+    'recomputed, stale, waited',
+    ('name', 'result'),
+)
+
+# Блокировки внутри процесса, разделённые по хешу ключа.
+_LOCKS = [threading.RLock() for _ in range(64)]
+
+
+def _local_lock(key):
+    return _LOCKS[hash(key) % len(_LOCKS)]
+
+
+def _is_fresh(entry, beta):
+    _, expires, delta = entry
+    # -log(random()) > 0, поэтому срок сдвигается только вперёд
+    # пропорционально времени расчёта.
+    return time.time() - delta * beta * math.log(random.random()) < expires
+
+
+def _compute_and_store(key, compute, timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    cache.set(key, (value, finished + timeout, finished - started),
+              timeout + settings.CACHE_STALE_TTL)
+    return value
+
+
+def _wait_for(key, deadline):
+    while time.time() < deadline:
+        time.sleep(settings.CACHE_FILL_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _fill(key, compute, timeout, name, entry):
+    """Пересчёт одним исполнителем среди всех процессов."""
+    lock_key = f'{key}:fill-lock'
+    lock_timeout = settings.CACHE_FILL_LOCK_TIMEOUT
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = _compute_and_store(key, compute, timeout)
+        finally:
+            cache.delete(lock_key)
+        expired = entry is None or time.time() >= entry[1]
+        FILLS.inc(name=name, result='recomputed' if expired else 'early')
+        return value
+    if entry is not None:
+        FILLS.inc(name=name, result='stale')
+        return entry[0]
+    entry = _wait_for(key, time.time() + lock_timeout)
+    if entry is not None:
+        FILLS.inc(name=name, result='waited')
+        return entry[0]
+    FILLS.inc(name=name, result='recomputed')
+    return _compute_and_store(key, compute, timeout)
+
+
+def get_or_compute(key, compute, timeout, name='default', beta=1.0):
+    """Значение из кеша или результат compute() с защитой от давки."""
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, beta):
+        FILLS.inc(name=name, result='fresh')
+        return entry[0]
+    # Потоки процесса ждут на общей блокировке, а между процессами
+    # исполнителя выбирает атомарный cache.add в _fill.
+    local_lock = _local_lock(key)
+    if entry is not None:
+        acquired = local_lock.acquire(blocking=False)
+        if not acquired:
+            FILLS.inc(name=name, result='stale')
+            return entry[0]
+    else:
+        acquired = local_lock.acquire(
+            timeout=settings.CACHE_FILL_LOCK_TIMEOUT)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry, 0):
+            if acquired:
+                local_lock.release()
+            FILLS.inc(name=name, result='waited')
+            return entry[0]
+    try:
+        return _fill(key, compute, timeout, name, entry)
+    finally:
+        if acquired:
+            local_lock.release()
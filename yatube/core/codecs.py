@@ -0,0 +1,106 @@
+"""Кодеки значений кеша и компактные записи объектов моделей.
+
+Кодек превращает значение в bytes и обратно; бэкенд кеша выбирает его
+по OPTIONS['CODEC']. Списки объектов моделей перед кодированием можно
+заменить записями Records: кортежами значений полей без служебного
+состояния моделей.
+"""
+import pickle
+import zlib
+from collections import namedtuple
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model
+from django.utils.module_loading import import_string
+
+DEFAULT_CODEC = 'core.codecs.PickleCodec'
+
+
+class PickleCodec:
+    def encode(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+
+class ZlibCodec(PickleCodec):
+    """pickle со сжатием zlib, если данные длиннее min_length байт."""
+
+    RAW = b'\x00'
+    COMPRESSED = b'\x01'
+
+    def __init__(self, min_length=1024, level=6):
+        self.min_length = min_length
+        self.level = level
+
+    def encode(self, value):
+        data = super().encode(value)
+        if len(data) >= self.min_length:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return self.COMPRESSED + compressed
+        return self.RAW + data
+
+    def decode(self, data):
+        body = data[1:]
+        if data[:1] == self.COMPRESSED:
+            body = zlib.decompress(body)
+        return super().decode(body)
+
+
+def get_codec(options):
+    codec = import_string(options.get('CODEC', DEFAULT_CODEC))
+    return codec(**options.get('CODEC_OPTIONS', {}))
+
+
+# Записи объектов одной модели: rows — пары (значения полей, связанные).
+Records = namedtuple('Records', 'label db rows')
+
+
+def _to_row(instance):
+    values = tuple(getattr(instance, field.attname)
+                   for field in instance._meta.concrete_fields)
+    related = []
+    for name, obj in instance._state.fields_cache.items():
+        # Обратные связи и неполные объекты просто не сохраняем.
+        if obj is not None and obj.get_deferred_fields():
+            continue
+        try:
+            field = instance._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and field.is_relation:
+            related.append((name, None if obj is None else _to_row(obj)))
+    return values, tuple(related)
+
+
+def _from_row(model, db, row):
+    values, related = row
+    instance = model.from_db(db, None, values)
+    for name, related_row in related:
+        field = model._meta.get_field(name)
+        field.set_cached_value(instance, None if related_row is None else
+                               _from_row(field.related_model, db,
+                                         related_row))
+    return instance
+
+
+def to_records(objects):
+    """Records для списка объектов одной модели или сам список."""
+    if not objects or not isinstance(objects[0], Model):
+        return objects
+    model = type(objects[0])
+    if any(type(obj) is not model or obj.get_deferred_fields()
+           for obj in objects):
+        return objects
+    return Records(model._meta.label, objects[0]._state.db,
+                   [_to_row(obj) for obj in objects])
+
+
+def from_records(value):
+    if not isinstance(value, Records):
+        return value
+    model = apps.get_model(value.label)
+    return [_from_row(model, value.db, row) for row in value.rows]
@@ -0,0 +1,86 @@
+"""Сжатие ответов и файлов в gzip и brotli.
+
+Пакет brotli не обязателен: без него доступен только gzip.
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Расширения файлов со сжатыми копиями по способу сжатия.
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def encodings():
+    """Доступные способы сжатия в порядке предпочтения."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding):
+    """Сжатые байты для файлов: самый сильный уровень, без даты в gzip."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def accepted(accept_encoding, available=None):
+    """Способы сжатия из available, которые принимает клиент, по порядку.
+
+    Учитывается q=0 в Accept-Encoding; остальные веса не меняют порядок,
+    выбранный сервером.
+    """
+    refused = set()
+    allowed = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = params.strip().replace(' ', '')
+        if quality in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            refused.add(coding)
+        elif coding:
+            allowed.add(coding)
+    return [encoding for encoding in (available or encodings())
+            if encoding not in refused
+            and (encoding in allowed or '*' in allowed)]
+
+
+class StreamCompressor:
+    """Сжатие потока: после каждой части выход сбрасывается, чтобы
+    клиент получал её сразу."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(
+                quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31 — формат gzip с заголовком и контрольной суммой.
+            self._compressor = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return (self._compressor.compress(data)
+                + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def attach(response, encoding, data):
+    """Запоминает готовое сжатое тело ответа, например из кеша страниц.
+
+    CompressionMiddleware отдаст его вместо повторного сжатия, если тело
+    ответа с тех пор не изменилось.
+    """
+    if not hasattr(response, 'precompressed'):
+        response.precompressed = {}
+    response.precompressed[encoding] = (len(response.content), data)
@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_local = threading.local()
+_lock = threading.Lock()
+_view_stats = {}
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.thumbnail_lookups = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, duration):
+        """Значение заголовка Server-Timing в миллисекундах."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;desc="hits={self.cache_hits} '
+            f'misses={self.cache_misses}"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'thumb;desc="{self.thumbnail_lookups} lookups"',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+
+
+def start():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def stop():
+    _local.stats = None
+
+
+def current():
+    """Счётчики текущего запроса или None, если замер не идёт."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    """Включает замер на время блока.
+
+    Вложенный вызов продолжает счётчики уже идущего замера.
+    """
+    stats = current()
+    if stats is not None:
+        yield stats
+        return
+    stats = start()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            yield stats
+    finally:
+        stop()
+
+
+@contextmanager
+def attach(stats):
+    """Считает в stats запросы текущего потока, например из пула."""
+    previous = current()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def query_timer(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper."""
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def record_cache(hit):
+    stats = current()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+def record_template(duration):
+    stats = current()
+    if stats is not None:
+        stats.template_time += duration
+
+
+def record_thumbnail():
+    stats = current()
+    if stats is not None:
+        stats.thumbnail_lookups += 1
+
+
+def view_name(request):
+    """Имя view вида posts:index для метрик."""
+    match = request.resolver_match
+    return match.view_name if match else UNRESOLVED_VIEW
+
+
+def aggregate(name, stats, duration):
+    """Добавляет счётчики запроса к сумме по имени view."""
+    with _lock:
+        totals = _view_stats.setdefault(name, {
+            'requests': 0,
+            'time': 0.0,
+            'queries': 0,
+            'db_time': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'template_time': 0.0,
+            'thumbnail_lookups': 0,
+        })
+        totals['requests'] += 1
+        totals['time'] += duration
+        totals['queries'] += stats.queries
+        totals['db_time'] += stats.db_time
+        totals['cache_hits'] += stats.cache_hits
+        totals['cache_misses'] += stats.cache_misses
+        totals['template_time'] += stats.template_time
+        totals['thumbnail_lookups'] += stats.thumbnail_lookups
+
+
+def view_stats():
+    """Копия накопленных сумм по всем view."""
+    with _lock:
+        return {name: dict(totals) for name, totals in _view_stats.items()}
+
+
+def reset():
+    with _lock:
+        _view_stats.clear()
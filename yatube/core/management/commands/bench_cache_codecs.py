@@ -0,0 +1,90 @@
+import pickle
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.utils import timezone
+
+from core import codecs
+from posts.cards import CARD_TEMPLATE
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер значений кеша ленты и время их '
+            'кодирования разными кодеками без обращений к БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10,
+                            help='Количество постов на странице ленты')
+        parser.add_argument('--repeat', type=int, default=1000,
+                            help='Число кодирований на замер')
+        parser.add_argument('--min-length', type=int, default=1024,
+                            help='Порог сжатия ZlibCodec, байт')
+
+    def make_posts(self, count):
+        now = timezone.now()
+        posts = []
+        for i in range(1, count + 1):
+            # Как после select_related: у каждого поста свои объекты.
+            author = User(id=1, username='author', first_name='Лев',
+                          last_name='Толстой')
+            group = Group(id=1, title='Группа', slug='group',
+                          description='Описание группы')
+            post = Post(id=i, text=f'Текст поста номер {i} ' * 10,
+                        author=author, group=group, pub_date=now,
+                        image='')
+            post._state.adding = False
+            post._state.db = 'default'
+            posts.append(post)
+        return posts
+
+    def make_samples(self, posts):
+        """(название, значение, исходное значение, восстановление)"""
+        template = get_template(CARD_TEMPLATE, using='django')
+        cards = [template.render({'post': post, 'show_author': True,
+                                  'show_group': True}) for post in posts]
+        return [
+            ('карточка поста', cards[0], cards[0], None),
+            ('HTML ленты', ''.join(cards), ''.join(cards), None),
+            ('объекты ленты', posts, posts, None),
+            ('записи ленты', codecs.to_records(posts), posts,
+             codecs.from_records),
+        ]
+
+    def measure(self, codec, value, restore, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            data = codec.encode(value)
+        encode = (time.perf_counter() - started) / repeat * 1e6
+        started = time.perf_counter()
+        for _ in range(repeat):
+            decoded = codec.decode(data)
+            if restore is not None:
+                restore(decoded)
+        decode = (time.perf_counter() - started) / repeat * 1e6
+        return len(data), encode, decode
+
+    def handle(self, *args, **options):
+        codec_list = {
+            'pickle': codecs.PickleCodec(),
+            'pickle+zlib': codecs.ZlibCodec(
+                min_length=options['min_length']),
+        }
+        samples = self.make_samples(self.make_posts(options['posts']))
+        self.stdout.write(f'{"значение":<18}{"кодек":<14}{"байт":>8}'
+                          f'{"экономия":>10}{"encode, мкс":>14}'
+                          f'{"decode, мкс":>14}')
+        for name, value, original, restore in samples:
+            baseline = len(pickle.dumps(original, pickle.HIGHEST_PROTOCOL))
+            for codec_name, codec in codec_list.items():
+                size, encode, decode = self.measure(
+                    codec, value, restore, options['repeat'])
+                saved = 1 - size / baseline
+                self.stdout.write(
+                    f'{name:<18}{codec_name:<14}{size:>8}'
+                    f'{saved:>10.0%}{encode:>14.1f}{decode:>14.1f}'
+                )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы метрик процессов из METRICS_DIR. Запускайте '
+            'перед стартом воркеров, пока ни один процесс в них не пишет')
+
+    def handle(self, *args, **options):
+        removed = metrics.REGISTRY.clear_directory()
+        self.stdout.write(f'Удалено файлов метрик: {removed}')
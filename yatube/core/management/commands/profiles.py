@@ -0,0 +1,38 @@
+from collections import Counter
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = ('Список сохранённых профилей запросов или их сумма '
+            'в виде свёрнутых стеков для flamegraph.pl')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Только профили этой view, '
+                                           'например posts:follow_index')
+        parser.add_argument('--collapse', action='store_true',
+                            help='Вывести суммарные свёрнутые стеки')
+
+    def handle(self, *args, **options):
+        profiles = profiling.load_all()
+        if options['view']:
+            profiles = [profile for profile in profiles
+                        if profile['view'] == options['view']]
+        if options['collapse']:
+            stacks = Counter()
+            for profile in profiles:
+                stacks.update(profile['stacks'])
+            for stack, count in sorted(stacks.items()):
+                self.stdout.write(f'{stack} {count}')
+            return
+        for profile in profiles:
+            started = datetime.fromtimestamp(profile['started'])
+            self.stdout.write(
+                f'{profile["name"]}  {started:%Y-%m-%d %H:%M:%S}  '
+                f'{profile["view"]}  {profile["duration"] * 1000:.1f} ms  '
+                f'{sum(profile["stacks"].values())} samples  '
+                f'{profile["method"]} {profile["path"]}'
+            )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кеши самыми популярными страницами и списками API '
+            'по статистике прошлого запуска. Кеш в памяти процесса так '
+            'не прогреть: для него включите WARMUP_ON_STARTUP')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.WARMUP_TOP,
+                            help='Сколько популярных адресов прогревать')
+        parser.add_argument('--workers', type=int,
+                            default=settings.WARMUP_WORKERS,
+                            help='Число потоков прогрева')
+        parser.add_argument('--path', action='append', default=[],
+                            help='Дополнительный адрес для прогрева')
+
+    def handle(self, *args, **options):
+        paths = warmup.hottest(warmup.compact(), options['top'])
+        paths += [path for path in options['path'] if path not in paths]
+        results = warmup.warm(paths, options['workers'])
+        for path, status, duration in results:
+            self.stdout.write(f'{status or "ошибка":>6}'
+                              f'{duration * 1000:>10.1f} мс  {path}')
+        failed = sum(status != 200 for _, status, _ in results)
+        self.stdout.write(f'Прогрето адресов: {len(results) - failed}, '
+                          f'с ошибкой: {failed}')
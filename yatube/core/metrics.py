@@ -0,0 +1,392 @@
+"""Счётчики, gauge и гистограммы в текстовом формате Prometheus.
+
+Если задан settings.METRICS_DIR, каждый процесс пишет свои значения
+в отдельный файл этого каталога через mmap, а выдача метрик
+суммирует файлы всех процессов. Gauge завершившихся процессов
+в выдачу не попадают, счётчики и гистограммы сохраняются до очистки
+каталога командой clear_metrics при запуске сервера. Без METRICS_DIR
+значения живут в памяти процесса.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+_HEADER = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+
+
+def _encode_key(key):
+    encoded = json.dumps(key).encode()
+    padding = -(_KEY_LENGTH.size + len(encoded)) % 8
+    return encoded + b' ' * padding
+
+
+def _iter_entries(data, used):
+    """Разбирает записи (ключ, значение, позиция значения) из буфера."""
+    position = _HEADER.size
+    while position < used:
+        length, = _KEY_LENGTH.unpack_from(data, position)
+        position += _KEY_LENGTH.size
+        name, sample_name, labels = json.loads(
+            bytes(data[position:position + length]))
+        position += length
+        value, = _VALUE.unpack_from(data, position)
+        key = (name, sample_name, tuple(tuple(pair) for pair in labels))
+        yield key, value, position
+        position += _VALUE.size
+
+
+def read_file(path):
+    """Значения из файла метрик другого процесса."""
+    with open(path, 'rb') as metrics_file:
+        data = metrics_file.read()
+    if len(data) < _HEADER.size:
+        return {}
+    used, = _HEADER.unpack_from(data, 0)
+    return {key: value for key, value, _ in _iter_entries(data, used)}
+
+
+class DictStore:
+    """Значения метрик в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def items(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class MmapStore:
+    """Значения метрик процесса в файле, отображённом в память.
+
+    Формат файла: 8 байт с длиной занятой части, затем записи
+    «длина ключа, JSON-ключ, выравнивание, double».
+    """
+
+    initial_size = 1 << 16
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.initial_size
+            self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used, = _HEADER.unpack_from(self._mmap, 0)
+        if not self._used:
+            self._used = _HEADER.size
+            _HEADER.pack_into(self._mmap, 0, self._used)
+        for key, _, position in _iter_entries(self._mmap, self._used):
+            self._positions[key] = position
+
+    def _position(self, key):
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+        encoded = _encode_key(key)
+        entry_size = _KEY_LENGTH.size + len(encoded) + _VALUE.size
+        while self._used + entry_size > len(self._mmap):
+            self._grow()
+        offset = self._used
+        _KEY_LENGTH.pack_into(self._mmap, offset, len(encoded))
+        offset += _KEY_LENGTH.size
+        self._mmap[offset:offset + len(encoded)] = encoded
+        offset += len(encoded)
+        _VALUE.pack_into(self._mmap, offset, 0.0)
+        # Длина занятой части пишется последней, чтобы читатели
+        # других процессов не увидели недописанную запись.
+        self._used += entry_size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = offset
+        return offset
+
+    def _grow(self):
+        size = len(self._mmap) * 2
+        self._mmap.close()
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+
+    def inc(self, key, amount):
+        with self._lock:
+            position = self._position(key)
+            value, = _VALUE.unpack_from(self._mmap, position)
+            _VALUE.pack_into(self._mmap, position, value + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            _VALUE.pack_into(self._mmap, self._position(key), value)
+
+    def items(self):
+        with self._lock:
+            return {key: value for key, value, _
+                    in _iter_entries(self._mmap, self._used)}
+
+
+def _is_alive(path):
+    """Жив ли процесс, которому принадлежит файл <pid>.db."""
+    try:
+        pid = int(os.path.splitext(os.path.basename(path))[0])
+    except ValueError:
+        # Файл не процесса: владельца не проверить.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Набор метрик и хранилище их значений."""
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._metrics = {}
+        self._store = None
+        self._store_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is not None:
+            return self._directory
+        return getattr(settings, 'METRICS_DIR', None)
+
+    @property
+    def store(self):
+        # После fork у дочернего процесса должен быть свой файл.
+        pid = os.getpid()
+        if self._store_pid != pid:
+            with self._lock:
+                if self._store_pid != pid:
+                    directory = self.directory
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                        self._store = MmapStore(
+                            os.path.join(directory, f'{pid}.db'))
+                    else:
+                        self._store = DictStore()
+                    self._store_pid = pid
+        return self._store
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже существует')
+        self._metrics[metric.name] = metric
+
+    def collect(self):
+        """Значения всех процессов, просуммированные по ключу."""
+        directory = self.directory
+        if not directory:
+            return self.store.items()
+        values = {}
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            alive = _is_alive(path)
+            for key, value in read_file(path).items():
+                # Gauge описывает текущее состояние процесса: у
+                # завершившегося (или убитого) процесса оно недействительно.
+                if not alive and self._is_gauge(key[0]):
+                    continue
+                values[key] = values.get(key, 0.0) + value
+        return values
+
+    def _is_gauge(self, name):
+        metric = self._metrics.get(name)
+        return metric is not None and metric.type == 'gauge'
+
+    def clear_directory(self):
+        """Удаляет файлы процессов из каталога; возвращает их число.
+
+        Вызывается до старта воркеров: иначе значения прошлых
+        запусков складываются с новыми.
+        """
+        directory = self.directory
+        if not directory:
+            return 0
+        removed = 0
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+        return removed
+
+    def generate_latest(self):
+        """Текст для Prometheus."""
+        samples = {}
+        for key, value in self.collect().items():
+            samples.setdefault(key[0], []).append((key[1], key[2], value))
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for sample_name, labels, value in metric.expose(
+                    samples.get(name, [])):
+                lines.append(f'{sample_name}{_format_labels(labels)} '
+                             f'{_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(),
+                 registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labelnames}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def _key(self, sample_name, labels):
+        return (self.name, sample_name, labels)
+
+    def expose(self, samples):
+        return sorted(samples)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Счётчик не может уменьшаться')
+        key = self._key(self.name, self._labels(labels))
+        self.registry.store.inc(key, amount)
+
+
+class Gauge(Metric):
+    """Gauge; значения разных процессов складываются."""
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(self.name, self._labels(labels))
+        self.registry.store.inc(key, amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(self.name, self._labels(labels))
+        self.registry.store.set(key, value)
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, registry=None):
+        buckets = tuple(sorted(buckets))
+        if buckets[-1] != math.inf:
+            buckets += (math.inf,)
+        self.buckets = buckets
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        store = self.registry.store
+        for bound in self.buckets:
+            if value <= bound:
+                break
+        # Корзины хранятся некумулятивно и складываются при выдаче.
+        bucket_labels = labels + (('le', _format_value(bound)),)
+        store.inc(self._key(f'{self.name}_bucket', bucket_labels), 1)
+        store.inc(self._key(f'{self.name}_sum', labels), value)
+        store.inc(self._key(f'{self.name}_count', labels), 1)
+
+    def expose(self, samples):
+        buckets = {}
+        other = []
+        for sample_name, labels, value in samples:
+            if sample_name != f'{self.name}_bucket':
+                other.append((sample_name, labels, value))
+                continue
+            labels = dict(labels)
+            bound = labels.pop('le')
+            series = tuple(labels.items())
+            buckets.setdefault(series, {})[bound] = value
+        result = []
+        for series, counts in sorted(buckets.items()):
+            total = 0.0
+            for bound in self.buckets:
+                le = _format_value(bound)
+                total += counts.get(le, 0.0)
+                result.append((f'{self.name}_bucket',
+                               series + (('le', le),), total))
+        return result + sorted(other)
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса',
+    ('view',),
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_seconds',
+    'Время запросов к БД за один HTTP-запрос',
+    ('view',),
+)
+RESPONSES = Counter(
+    'http_responses_total',
+    'Ответы по view и коду статуса',
+    ('view', 'status'),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'Запросы, обрабатываемые в данный момент',
+)
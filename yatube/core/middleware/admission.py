@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from core import admission, instrumentation
+
+
+def has_valid_token(request):
+    """Заголовок Authorization с действующим JWT; без запроса к БД."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return False
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return False
+    try:
+        authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return False
+    return True
+
+
+class AdmissionMiddleware:
+    """Сбрасывает лишние запросы с 503, когда класс маршрута перегружен.
+
+    Лимиты задаются в ADMISSION_CLASSES. Записи пользователей, вошедших
+    через сессию или с действующим JWT, входят в первую очередь; одного
+    заголовка Authorization для этого мало. View из
+    ADMISSION_EXEMPT_VIEWS не ограничиваются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route_class = admission.classify(
+            request, instrumentation.view_name(request))
+        if route_class is None:
+            return None
+        gate = admission.get_gate(route_class)
+        priority = route_class == 'writes' and (
+            request.user.is_authenticated or has_valid_token(request))
+        if not gate.acquire(priority):
+            response = HttpResponse(
+                'Сервер перегружен, повторите запрос позже', status=503)
+            response['Retry-After'] = settings.ADMISSION_RETRY_AFTER
+            return response
+        request._admission_gate = gate
+        return None
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            gate = getattr(request, '_admission_gate', None)
+            if gate is not None:
+                gate.release()
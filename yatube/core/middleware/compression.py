@@ -0,0 +1,152 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from core import compression, instrumentation, metrics
+
+RESPONSES = metrics.Counter(
+    'http_compression_responses_total',
+    'Ответы по способу сжатия: compressed, reused, skipped или private',
+    ('view', 'encoding', 'result'),
+)
+INPUT_BYTES = metrics.Counter(
+    'http_compression_input_bytes_total',
+    'Размер тел ответов до сжатия',
+    ('view', 'encoding'),
+)
+OUTPUT_BYTES = metrics.Counter(
+    'http_compression_output_bytes_total',
+    'Размер тел ответов после сжатия',
+    ('view', 'encoding'),
+)
+CPU_TIME = metrics.Counter(
+    'http_compression_cpu_seconds_total',
+    'Процессорное время сжатия ответов',
+    ('view', 'encoding'),
+)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы в brotli или gzip по Accept-Encoding.
+
+    Потоковые ответы сжимаются по частям. Маленькие тела, ответы с
+    Content-Encoding, диапазоны, SSE и файлы, которые отдаёт веб-сервер,
+    не сжимаются. Готовое сжатое тело из кеша страниц отдаётся без
+    пересжатия. Должна стоять перед middleware, меняющими тело ответа.
+
+    HTML с токеном CSRF и страницы вошедших пользователей не сжимаются:
+    по размеру сжатого ответа с подставленным в страницу текстом можно
+    подобрать секрет из того же ответа (BREACH).
+    """
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodings = compression.accepted(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not encodings:
+            return response
+        view = instrumentation.view_name(request)
+        if self.has_secrets(request, response):
+            RESPONSES.inc(view=view, encoding=encodings[0], result='private')
+            return response
+        if response.streaming:
+            encoding = encodings[0]
+            response.streaming_content = self.compress_stream(
+                response.streaming_content, encoding, view)
+            del response['Content-Length']
+        else:
+            encoding = self.compress_content(response, encodings, view)
+            if encoding is None:
+                return response
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Сжатое тело побайтно отличается от исходного.
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def is_compressible(self, response):
+        if response.status_code in (204, 206, 304):
+            return False
+        if (response.has_header('Content-Encoding')
+                or response.has_header('X-Accel-Redirect')
+                or response.has_header('X-Sendfile')):
+            return False
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0]
+        return content_type.strip().lower() in settings.COMPRESSION_TYPES
+
+    def has_secrets(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type.strip().lower() != 'text/html':
+            return False
+        if request.META.get('CSRF_COOKIE_USED'):
+            return True
+        # Без cookie сессии пользователь анонимный, и БД не нужна.
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return False
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated
+
+    def compress_content(self, response, encodings, view):
+        """Сжимает тело ответа; способ сжатия или None, если не стоило."""
+        content = response.content
+        precompressed = getattr(response, 'precompressed', {})
+        for encoding in encodings:
+            length, data = precompressed.get(encoding, (None, None))
+            if length == len(content):
+                RESPONSES.inc(view=view, encoding=encoding, result='reused')
+                self.set_content(response, data, view, encoding, content)
+                return encoding
+        encoding = encodings[0]
+        started = time.thread_time()
+        compressor = compression.StreamCompressor(encoding)
+        data = compressor.compress(content) + compressor.finish()
+        CPU_TIME.inc(time.thread_time() - started, view=view,
+                     encoding=encoding)
+        if len(data) >= len(content):
+            RESPONSES.inc(view=view, encoding=encoding, result='skipped')
+            return None
+        RESPONSES.inc(view=view, encoding=encoding, result='compressed')
+        self.set_content(response, data, view, encoding, content)
+        return encoding
+
+    def set_content(self, response, data, view, encoding, content):
+        INPUT_BYTES.inc(len(content), view=view, encoding=encoding)
+        OUTPUT_BYTES.inc(len(data), view=view, encoding=encoding)
+        response.content = data
+        response['Content-Length'] = str(len(data))
+
+    def compress_stream(self, chunks, encoding, view):
+        compressor = compression.StreamCompressor(encoding)
+        cpu_time = 0
+        input_bytes = output_bytes = 0
+        try:
+            for chunk in chunks:
+                started = time.thread_time()
+                data = compressor.compress(chunk)
+                cpu_time += time.thread_time() - started
+                input_bytes += len(chunk)
+                output_bytes += len(data)
+                if data:
+                    yield data
+            data = compressor.finish()
+            output_bytes += len(data)
+            yield data
+        finally:
+            RESPONSES.inc(view=view, encoding=encoding, result='compressed')
+            CPU_TIME.inc(cpu_time, view=view, encoding=encoding)
+            INPUT_BYTES.inc(input_bytes, view=view, encoding=encoding)
+            OUTPUT_BYTES.inc(output_bytes, view=view, encoding=encoding)
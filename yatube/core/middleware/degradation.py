@@ -0,0 +1,112 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.http import HttpResponse
+
+from core import instrumentation, metrics, page_cache
+from core.circuit_breaker import breaker
+
+DEGRADED_RESPONSES = metrics.Counter(
+    'degraded_responses_total',
+    'Ответы без обращения к БД: stale или unavailable',
+    ('view', 'result'),
+)
+
+
+class QueryHealth:
+    """Обёртка execute_wrapper, отмечающая ошибки и медленные запросы."""
+
+    def __init__(self):
+        self.queries = 0
+        self.failed = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError:
+            self.failed = True
+            raise
+        finally:
+            self.queries += 1
+            if time.perf_counter() - started > settings.DB_BREAKER_SLOW_QUERY:
+                self.failed = True
+
+
+class DegradationMiddleware:
+    """Отдаёт последний удачный ответ, когда БД не справляется.
+
+    Для GET-запросов к DEGRADATION_VIEWS запоминает последний ответ
+    200. Пока предохранитель БД разомкнут или view упала с ошибкой БД,
+    клиент получает этот ответ с заголовком X-Stale, а если его нет —
+    503 с Retry-After.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def make_key(self, request):
+        """Ключ по cookie сессии, а не request.user.
+
+        Пользователь загружается запросами к БД, которые при её
+        перегрузке упали бы вне view, мимо process_exception.
+        """
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+        owner = hashlib.sha1(session.encode()).hexdigest() if session else 0
+        path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+        return f'stale:{owner}:{path}'
+
+    def stale_response(self, request):
+        request._degraded = True
+        entry = cache.get(request._stale_key)
+        view = instrumentation.view_name(request)
+        if entry is None:
+            DEGRADED_RESPONSES.inc(view=view, result='unavailable')
+            response = HttpResponse('Сервис временно перегружен',
+                                    status=503)
+            response['Retry-After'] = settings.DB_BREAKER_COOLDOWN
+            return response
+        DEGRADED_RESPONSES.inc(view=view, result='stale')
+        response = page_cache.unpack(entry)
+        response['X-Stale'] = '1'
+        response['Warning'] = '110 - "Response is Stale"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method != 'GET'
+                or instrumentation.view_name(request)
+                not in settings.DEGRADATION_VIEWS):
+            return None
+        request._stale_key = self.make_key(request)
+        if breaker.allow():
+            return None
+        return self.stale_response(request)
+
+    def process_exception(self, request, exception):
+        if (getattr(request, '_stale_key', None) is None
+                or not isinstance(exception, DatabaseError)):
+            return None
+        breaker.record_failure()
+        return self.stale_response(request)
+
+    def __call__(self, request):
+        health = QueryHealth()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(health))
+            response = self.get_response(request)
+        key = getattr(request, '_stale_key', None)
+        if key is None or getattr(request, '_degraded', False):
+            return response
+        if health.failed:
+            breaker.record_failure()
+        elif health.queries:
+            breaker.record_success()
+        if response.status_code == 200 and not response.streaming:
+            page_cache.store(key, response, settings.STALE_RESPONSE_TIMEOUT)
+        return response
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import instrumentation
+
+
+class InstrumentationMiddleware:
+    """Считает запросы к БД, кеш, шаблоны и миниатюры для каждого запроса.
+
+    Результат отдаётся в заголовке Server-Timing и суммируется
+    по имени view. При INSTRUMENTATION_ENABLED = False
+    middleware отключается целиком.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with instrumentation.collect() as stats:
+            response = self.get_response(request)
+        duration = stats.elapsed()
+        instrumentation.aggregate(instrumentation.view_name(request),
+                                  stats, duration)
+        response['Server-Timing'] = stats.server_timing(duration)
+        return response
@@ -0,0 +1,25 @@
+import time
+
+from core import instrumentation, metrics
+
+
+class MetricsMiddleware:
+    """Пишет время ответа, время БД и коды статусов по имени view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        metrics.REQUESTS_IN_PROGRESS.inc()
+        try:
+            with instrumentation.collect() as stats:
+                response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_PROGRESS.dec()
+        view = instrumentation.view_name(request)
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                        view=view)
+        metrics.REQUEST_DB_TIME.observe(stats.db_time, view=view)
+        metrics.RESPONSES.inc(view=view, status=response.status_code)
+        return response
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core import instrumentation, page_cache
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам сохранённые страницы из PAGE_CACHE_VIEWS.
+
+    Запросы с cookie сессии не кешируются, как и ответы, которые
+    ставят cookie или используют CSRF-токен. Должна стоять после
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_cacheable_request(self, request):
+        return (request.method in ('GET', 'HEAD')
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and instrumentation.view_name(request)
+                in settings.PAGE_CACHE_VIEWS
+                and not request.user.is_authenticated)
+
+    def is_cacheable_response(self, request, response):
+        return (response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED'))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_cacheable_request(request):
+            return None
+        request._page_cache_key = page_cache.make_key(request)
+        entry = cache.get(request._page_cache_key)
+        view = instrumentation.view_name(request)
+        if entry is None:
+            page_cache.REQUESTS.inc(view=view, result='miss')
+            return None
+        page_cache.REQUESTS.inc(view=view, result='hit')
+        response = page_cache.unpack(entry)
+        response['X-Page-Cache'] = 'hit'
+        return response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        if (key is not None and request.method == 'GET'
+                and not response.has_header('X-Page-Cache')
+                and self.is_cacheable_response(request, response)):
+            page_cache.store(key, response, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'miss'
+        return response
@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.conf import settings
+
+from core import instrumentation, profiling
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по просьбе staff или для случайной выборки.
+
+    Staff включает профилирование заголовком X-Profile или параметром
+    ?profile; остальные запросы попадают в выборку с вероятностью
+    PROFILING_SAMPLE_RATE. Должна стоять последней в MIDDLEWARE,
+    чтобы профиль описывал саму view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        # Сессия читается только по просьбе профилировать, иначе любой
+        # ответ получил бы Vary: Cookie.
+        if ('HTTP_X_PROFILE' in request.META
+                or 'profile' in request.GET) and request.user.is_staff:
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        started = time.perf_counter()
+        with profiling.Sampler(settings.PROFILING_INTERVAL) as sampler:
+            response = self.get_response(request)
+        name = profiling.save(sampler,
+                              instrumentation.view_name(request),
+                              request,
+                              response.status_code,
+                              time.perf_counter() - started)
+        response['X-Profile-Id'] = name
+        return response
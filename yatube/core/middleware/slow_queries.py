@@ -0,0 +1,26 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import slow_queries
+
+
+class SlowQueryMiddleware:
+    """Записывает запросы дольше SLOW_QUERY_THRESHOLD секунд."""
+
+    def __init__(self, get_response):
+        if getattr(settings, 'SLOW_QUERY_THRESHOLD', None) is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = slow_queries.RequestRecorder(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                return self.get_response(request)
+        finally:
+            recorder.finish()
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import instrumentation, warmup
+
+
+class AccessStatsMiddleware:
+    """Считает успешные GET-запросы к WARMUP_VIEWS для прогрева кешей.
+
+    Запросы самого прогрева с заголовком X-Warmup не учитываются.
+    Без WARMUP_STATS_DIR middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.WARMUP_STATS_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method == 'GET'
+                and response.status_code == 200
+                and 'HTTP_X_WARMUP' not in request.META
+                and instrumentation.view_name(request)
+                in settings.WARMUP_VIEWS):
+            warmup.record(warmup.stats_path(request))
+        return response
@@ -0,0 +1,61 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    fingerprint = models.CharField(
+        verbose_name='Отпечаток',
+        max_length=40,
+        unique=True)
+    sql = models.TextField(
+        verbose_name='Нормализованный SQL')
+    example_params = models.TextField(
+        verbose_name='Параметры примера',
+        blank=True)
+    view = models.CharField(
+        verbose_name='View',
+        max_length=200,
+        blank=True)
+    location = models.CharField(
+        verbose_name='Место вызова',
+        max_length=300,
+        blank=True)
+    plan = models.TextField(
+        verbose_name='План запроса',
+        blank=True)
+    count = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=0)
+    total_time = models.FloatField(
+        verbose_name='Суммарное время, с',
+        default=0)
+    max_time = models.FloatField(
+        verbose_name='Максимальное время, с',
+        default=0)
+    last_seen = models.DateTimeField(
+        verbose_name='Последний раз',
+        auto_now=True)
+
+    class Meta:
+        ordering = ['-total_time']
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return self.sql[:50]
+
+
+class StoredFile(models.Model):
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        unique=True)
+    references = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=0)
+
+    class Meta:
+        verbose_name = 'Файл в хранилище по содержимому'
+        verbose_name_plural = 'Файлы в хранилище по содержимому'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,105 @@
+"""Кеш объектов моделей с чтением через кеш.
+
+Объект хранится по первичному ключу, а вторичные ключи (slug,
+username) указывают на первичный. Запись сбрасывается при сохранении
+и удалении объекта.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+from core import metrics
+
+REQUESTS = metrics.Counter(
+    'object_cache_requests_total',
+    'Поиск объектов через кеш: hit или miss',
+    ('model', 'result'),
+)
+
+
+class ObjectCache:
+    """Поиск объектов model по pk или одному из keys через кеш.
+
+    Если задан fields, загружаются и кешируются только эти поля.
+    """
+
+    def __init__(self, model, keys=(), fields=None):
+        self.model = model
+        self.keys = tuple(keys)
+        self.fields = fields
+        post_save.connect(self._changed, sender=model, weak=False)
+        post_delete.connect(self._changed, sender=model, weak=False)
+
+    def _key(self, field, value):
+        return f'obj:{self.model._meta.label_lower}:{field}:{value}'
+
+    def get_cached(self, **lookup):
+        """Как get(), но сначала ищет объект в кеше."""
+        ((field, value),) = lookup.items()
+        if field == 'id':
+            field = 'pk'
+        manager = self.model._default_manager
+        if self.fields is not None:
+            manager = manager.only(*self.fields)
+        if field != 'pk' and field not in self.keys:
+            return manager.get(**lookup)
+        pk = value if field == 'pk' else cache.get(self._key(field, value))
+        instance = None if pk is None else cache.get(self._key('pk', pk))
+        if instance is not None and (
+                field == 'pk' or getattr(instance, field) == value):
+            REQUESTS.inc(model=self.model._meta.label, result='hit')
+            return instance
+        REQUESTS.inc(model=self.model._meta.label, result='miss')
+        instance = manager.get(**{field: value})
+        self._store(instance)
+        return instance
+
+    def _store(self, instance):
+        cache.set_many({
+            self._key('pk', instance.pk): instance,
+            **{self._key(field, getattr(instance, field)): instance.pk
+               for field in self.keys},
+        }, settings.OBJECT_CACHE_TIMEOUT)
+
+    def invalidate(self, pks):
+        """Сбрасывает объекты с указанными pk, в том числе после коммита."""
+        keys = [self._key('pk', pk) for pk in pks]
+        if not keys:
+            return
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def _changed(self, sender, instance, **kwargs):
+        # Вторичные ключи со старыми значениями остаются в кеше,
+        # но get_cached() сверяет их с самим объектом.
+        self.invalidate([instance.pk])
+
+
+class ObjectCacheManager(models.Manager):
+    """Менеджер с get_cached() и invalidate() из ObjectCache."""
+
+    def __init__(self, keys=()):
+        super().__init__()
+        self.keys = tuple(keys)
+
+    def contribute_to_class(self, model, name):
+        super().contribute_to_class(model, name)
+        if not model._meta.abstract:
+            self.object_cache = ObjectCache(model, self.keys)
+
+    def get_cached(self, **lookup):
+        return self.object_cache.get_cached(**lookup)
+
+    def invalidate(self, pks):
+        self.object_cache.invalidate(pks)
+
+
+def get_cached_or_404(source, **lookup):
+    """get_object_or_404 для ObjectCache или менеджера с кешем."""
+    try:
+        return source.get_cached(**lookup)
+    except source.model.DoesNotExist:
+        raise Http404(
+            f'No {source.model._meta.object_name} matches the given query.')
@@ -0,0 +1,58 @@
+"""Кеш целых страниц для анонимных посетителей.
+
+Ключ страницы содержит поколение контента; invalidate() начинает новое
+поколение, и все сохранённые страницы перестают запрашиваться.
+"""
+import gzip
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core import compression, metrics
+
+GENERATION_KEY = 'page-cache:generation'
+
+REQUESTS = metrics.Counter(
+    'page_cache_requests_total',
+    'Запросы к кешу страниц анонимов: hit или miss',
+    ('view', 'result'),
+)
+
+
+def generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def invalidate():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def make_key(request):
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f'page-cache:{generation()}:{path}'
+
+
+def pack(response):
+    """Ответ в виде, пригодном для кеша; тело сжато gzip."""
+    return (response.status_code,
+            response['Content-Type'],
+            gzip.compress(response.content))
+
+
+def unpack(entry):
+    """Ответ из кеша; сжатое тело отдаётся клиентам с gzip без пересжатия."""
+    status, content_type, compressed = entry
+    response = HttpResponse(gzip.decompress(compressed),
+                            content_type=content_type,
+                            status=status)
+    compression.attach(response, 'gzip', compressed)
+    return response
+
+
+def store(key, response, timeout):
+    """Сохраняет ответ в кеш и оставляет сжатое тело при нём."""
+    entry = pack(response)
+    cache.set(key, entry, timeout)
+    compression.attach(response, 'gzip', entry[2])
@@ -0,0 +1,85 @@
+"""Статистический профайлер: периодически снимает стек потока запроса."""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{code.co_name}'
+
+
+def collapse(frame):
+    """Стек от корня к листу в формате «a;b;c»."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Снимает стек заданного потока каждые interval секунд."""
+
+    def __init__(self, interval, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def save(sampler, view, request, status, duration):
+    """Сохраняет профиль в PROFILING_DIR и возвращает имя файла."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    started = time.time() - duration
+    name = f'{started:.6f}-{os.getpid()}.json'
+    profile = {
+        'view': view,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': status,
+        'started': started,
+        'duration': duration,
+        'interval': sampler.interval,
+        'stacks': dict(sampler.stacks),
+    }
+    with open(os.path.join(settings.PROFILING_DIR, name), 'w') as file:
+        json.dump(profile, file)
+    return name
+
+
+def load_all():
+    """Все сохранённые профили, от старых к новым."""
+    directory = settings.PROFILING_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as file:
+            profile = json.load(file)
+        profile['name'] = name
+        profiles.append(profile)
+    return profiles
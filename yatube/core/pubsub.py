@@ -0,0 +1,237 @@
+"""Публикация событий и подписка на них внутри процесса.
+
+Подписчики — асинхронные потоки событий (SSE), публикуют обычные
+синхронные view и сигналы. Доставку между процессами берёт на себя
+транспорт из PUBSUB_TRANSPORT: LocalTransport работает в пределах
+одного процесса, CacheTransport — через кеш Django, общий для всех
+процессов (не LocMem), например когда посты создают WSGI-процессы,
+а SSE отдаёт отдельный ASGI-процесс.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = metrics.Counter(
+    'pubsub_messages_total',
+    'Сообщения pub/sub: published или delivered',
+    ('result',),
+)
+SUBSCRIBERS = metrics.Gauge(
+    'pubsub_subscribers',
+    'Активные подписки pub/sub',
+)
+
+
+class Subscription:
+    """Очередь сообщений каналов channels в event loop подписчика.
+
+    Сообщения сверх maxsize отбрасываются: медленный клиент догонит их
+    после переподключения.
+    """
+
+    def __init__(self, hub, channels, maxsize=100):
+        self.hub = hub
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, channel, message):
+        self.loop.call_soon_threadsafe(self._put, (channel, message))
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout=None):
+        """(канал, сообщение) или None, если за timeout ничего не пришло."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Hub:
+    def __init__(self, transport):
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        SUBSCRIBERS.inc()
+        self.transport.start(self.dispatch)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+        SUBSCRIBERS.dec()
+
+    def publish(self, channel, message):
+        """Публикует message (значение, которое сериализуется в JSON)."""
+        MESSAGES.inc(result='published')
+        try:
+            self.transport.publish(channel, message, self.dispatch)
+        except Exception:
+            # События необязательны: ошибка транспорта не ломает запрос.
+            logger.exception('Не удалось опубликовать событие %s', channel)
+
+    def dispatch(self, channel, message):
+        """Доставляет сообщение подписчикам этого процесса."""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(channel, message)
+        if subscribers:
+            MESSAGES.inc(len(subscribers), result='delivered')
+
+
+class LocalTransport:
+    """Сообщения доставляются только подписчикам того же процесса."""
+
+    def publish(self, channel, message, dispatch):
+        dispatch(channel, message)
+
+    def start(self, dispatch):
+        pass
+
+
+class CacheTransport:
+    """Сообщения через общий кеш Django.
+
+    Публикация увеличивает счётчик в кеше и пишет сообщение под его
+    номером. Поток в процессе с подписчиками раз в poll_interval
+    секунд читает новые номера одним get_many. Номер, сообщение под
+    которым ещё не записано, ждёт до gap_timeout секунд.
+    """
+
+    SEQUENCE_KEY = 'pubsub:sequence'
+    PUBLISH_ATTEMPTS = 10
+
+    def __init__(self, cache='default', poll_interval=1, timeout=60,
+                 gap_timeout=5):
+        self.cache_alias = cache
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.gap_timeout = gap_timeout
+        self._thread = None
+        self._lock = threading.Lock()
+        # Первый незаписанный номер и когда его заметили.
+        self._gap = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _message_key(self, number):
+        return f'pubsub:message:{number}'
+
+    def publish(self, channel, message, dispatch):
+        self.cache.add(self.SEQUENCE_KEY, 0, None)
+        # incr не у всех кешей атомарен, и номер может достаться двум
+        # процессам: сообщение пишется через add, проигравший берёт
+        # следующий номер.
+        for _ in range(self.PUBLISH_ATTEMPTS):
+            number = self.cache.incr(self.SEQUENCE_KEY)
+            if self.cache.add(self._message_key(number), (channel, message),
+                              self.timeout):
+                return
+        raise RuntimeError('Не удалось занять номер сообщения')
+
+    def start(self, dispatch):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._poll, args=(dispatch,), name='pubsub-poll',
+                daemon=True)
+            self._thread.start()
+
+    def _poll(self, dispatch):
+        last = self.cache.get(self.SEQUENCE_KEY, 0)
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                last = self.receive(last, dispatch)
+            except Exception:
+                logger.exception('Не удалось прочитать события из кеша')
+
+    def receive(self, last, dispatch):
+        """Доставляет сообщения после номера last; новый last."""
+        current = self.cache.get(self.SEQUENCE_KEY, 0)
+        if current <= last:
+            # Счётчик мог пропасть из кеша и начаться заново.
+            return current
+        numbers = range(last + 1, current + 1)
+        found = self.cache.get_many(
+            [self._message_key(number) for number in numbers])
+        for number in numbers:
+            key = self._message_key(number)
+            if key in found:
+                dispatch(*found[key])
+                continue
+            # Номер уже выдан, а сообщение ещё не записано: чтение
+            # продолжится с него, пока пропуск не простоит gap_timeout.
+            now = time.monotonic()
+            if self._gap is None or self._gap[0] != number:
+                self._gap = (number, now)
+            if now - self._gap[1] < self.gap_timeout:
+                return number - 1
+        return current
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            transport = import_string(settings.PUBSUB_TRANSPORT)(
+                **settings.PUBSUB_OPTIONS)
+            _hub = Hub(transport)
+        return _hub
+
+
+def reset():
+    global _hub
+    with _hub_lock:
+        _hub = None
+
+
+def publish(channel, message):
+    get_hub().publish(channel, message)
+
+
+def subscribe(channels):
+    return get_hub().subscribe(channels)
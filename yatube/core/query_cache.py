@@ -0,0 +1,144 @@
+"""Кеш результатов запросов с версиями таблиц.
+
+Ключ результата состоит из SQL, параметров и текущих версий всех
+таблиц запроса. Любая запись в таблицу из QUERY_CACHE_TABLES меняет её
+версию, поэтому старые результаты больше не запрашиваются.
+
+Версии хранятся в кеше 'default'. С LocMemCache он у каждого процесса
+свой: запись в одном процессе не меняет версий в других, и те отдают
+старые результаты до QUERY_CACHE_TIMEOUT. При нескольких процессах
+нужен общий для них кеш (memcached).
+"""
+import hashlib
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import models, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import codecs, metrics
+
+REQUESTS = metrics.Counter(
+    'query_cache_requests_total',
+    'Запросы через кеш результатов: hit, miss или uncacheable',
+    ('result',),
+)
+
+_WRITE = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+[`"]?(\w+)',
+    re.IGNORECASE)
+_IDENTIFIER = re.compile(r'[`"](\w+)[`"]')
+
+
+def _version_key(table):
+    return f'table-version:{table}'
+
+
+def versions(tables):
+    """Версии таблиц; отсутствующие в кеше начинаются заново."""
+    keys = [_version_key(table) for table in tables]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, value in missing.items():
+        cache.add(key, value, None)
+    if missing:
+        found.update(cache.get_many(list(missing)))
+    return [found.get(key) for key in keys]
+
+
+def bump(tables):
+    cache.set_many({_version_key(table): time.time_ns()
+                    for table in tables}, None)
+
+
+def write_watcher(execute, sql, params, many, context):
+    """Обёртка execute_wrapper: запись в таблицу меняет её версию."""
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        match = _WRITE.match(sql)
+        if match and match.group(1) in settings.QUERY_CACHE_TABLES:
+            tables = [match.group(1)]
+            bump(tables)
+            connection = context['connection']
+            if connection.in_atomic_block:
+                # Читатели могли закешировать данные до коммита.
+                transaction.on_commit(lambda: bump(tables),
+                                      using=connection.alias)
+
+
+@receiver(connection_created)
+def watch_writes(sender, connection, **kwargs):
+    # В начало списка: execute_wrapper() на выходе снимает последнюю
+    # обёртку, а соединение может открыться внутри такого контекста.
+    if write_watcher not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, write_watcher)
+
+
+def query_tables(sql):
+    known = {model._meta.db_table
+             for model in apps.get_models(include_auto_created=True)}
+    return sorted(set(_IDENTIFIER.findall(sql)) & known)
+
+
+def get_or_run(queryset, kind, run, timeout):
+    """Результат run() для запроса queryset из кеша, если это возможно."""
+    try:
+        sql, params = queryset.query.get_compiler(
+            using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return run()
+    tables = query_tables(sql)
+    if not set(tables) <= set(settings.QUERY_CACHE_TABLES):
+        REQUESTS.inc(result='uncacheable')
+        return run()
+    sql = ' '.join(sql.split())
+    digest = hashlib.sha1(
+        repr((kind, sql, params, versions(tables))).encode()).hexdigest()
+    key = f'query-cache:{queryset.db}:{digest}'
+    result = cache.get(key)
+    if result is not None:
+        REQUESTS.inc(result='hit')
+        return result
+    REQUESTS.inc(result='miss')
+    result = run()
+    cache.set(key, result, timeout)
+    return result
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet с методом cached() для кеширования результата."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone._cache_timeout = (settings.QUERY_CACHE_TIMEOUT
+                                if timeout is None else timeout)
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._cache_timeout is not None and self._result_cache is None:
+            # Объекты моделей хранятся компактными записями.
+            self._result_cache = codecs.from_records(get_or_run(
+                self, 'rows',
+                lambda: codecs.to_records(list(self._iterable_class(self))),
+                self._cache_timeout))
+        super()._fetch_all()
+
+    def count(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super().count()
+        return get_or_run(self, 'count', super().count, self._cache_timeout)
@@ -0,0 +1,191 @@
+"""Отдача статики и медиафайлов.
+
+При SENDFILE_BACKEND ответ содержит только заголовки, а сам файл
+отправляет веб-сервер: X-Sendfile (Apache, lighttpd) с путём к файлу или
+X-Accel-Redirect (nginx) с адресом внутреннего location из
+SENDFILE_LOCATIONS. Без него файл отдаётся через wsgi.file_wrapper,
+с поддержкой запросов диапазонов. Для статики выбирается заранее сжатая
+копия из collectstatic, если клиент её принимает.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import compression
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# <xx>/<sha256>.ext из ContentAddressedStorage и варианты
+# <sha256>_<ширина>x<высота>.ext из posts.images.
+CONTENT_ADDRESSED_MEDIA = re.compile(
+    r'(?:^|/)(?:[0-9a-f]{2}/[0-9a-f]{64}|[0-9a-f]{64}_\d+x\d+)\.\w+$')
+BLOCK_SIZE = 64 * 1024
+
+
+def _resolve(root, path):
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path
+
+
+def _encoded(request, full_path):
+    """Путь к сжатой копии файла и способ сжатия или (путь, None)."""
+    available = [encoding for encoding in compression.SUFFIXES
+                 if os.path.isfile(full_path
+                                   + compression.SUFFIXES[encoding])]
+    if not available:
+        return full_path, None
+    accepted = compression.accepted(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+    if not accepted:
+        return full_path, None
+    return full_path + compression.SUFFIXES[accepted[0]], accepted[0]
+
+
+def parse_range(header, size):
+    """(начало, конец) одного диапазона из Range или None.
+
+    None означает отдать файл целиком, ValueError — диапазон вне файла.
+    Несколько диапазонов в одном запросе не поддерживаются.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as served_file:
+        served_file.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            block = served_file.read(min(remaining, BLOCK_SIZE))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _file_response(request, path, stat, last_modified):
+    size = stat.st_size
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and if_range in (None, last_modified):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'))
+    start, end = byte_range
+    response = StreamingHttpResponse(_read_range(path, start, end),
+                                     status=206)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _sendfile_response(kind, root, path):
+    backend = settings.SENDFILE_BACKEND
+    response = HttpResponse()
+    if backend == 'x-accel-redirect':
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = (settings.SENDFILE_LOCATIONS[kind]
+                                        + relative)
+    else:
+        response['X-Sendfile'] = path
+    # Длину и тело подставит веб-сервер.
+    del response['Content-Type']
+    return response
+
+
+def serve(request, kind, root, path, max_age, immutable=False,
+          precompressed=False):
+    """Ответ с файлом path из каталога root.
+
+    kind — ключ SENDFILE_LOCATIONS, max_age — срок в Cache-Control, с,
+    immutable — имя файла меняется вместе с содержимым.
+    """
+    full_path = _resolve(root, path)
+    served_path, encoding = (_encoded(request, full_path) if precompressed
+                             else (full_path, None))
+    stat = os.stat(served_path)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    elif settings.SENDFILE_BACKEND:
+        response = _sendfile_response(kind, root, served_path)
+    else:
+        response = _file_response(request, served_path, stat,
+                                  last_modified)
+    if response.status_code not in (304, 416):
+        content_type, _ = mimetypes.guess_type(full_path)
+        response['Content-Type'] = (content_type
+                                    or 'application/octet-stream')
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    if precompressed:
+        response['Vary'] = 'Accept-Encoding'
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = f'public, max-age={max_age}'
+    if immutable:
+        response['Cache-Control'] += ', immutable'
+    return response
+
+
+def is_hashed(path):
+    """Имя статики с хешем из манифеста collectstatic."""
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return path in hashed_files.values()
+
+
+def static_file(request, path):
+    if is_hashed(path):
+        return serve(request, 'static', settings.STATIC_ROOT, path,
+                     settings.STATIC_MAX_AGE, immutable=True,
+                     precompressed=True)
+    return serve(request, 'static', settings.STATIC_ROOT, path,
+                 settings.STATIC_UNHASHED_MAX_AGE, precompressed=True)
+
+
+def is_content_addressed(path):
+    """Имя медиафайла по хешу содержимого: оригинал или его вариант."""
+    return CONTENT_ADDRESSED_MEDIA.search(path) is not None
+
+
+def media_file(request, path):
+    # Старые загрузки и миниатюры sorl (cache/) могут смениться под тем же
+    # именем, поэтому immutable только для имён по хешу содержимого.
+    if is_content_addressed(path):
+        return serve(request, 'media', settings.MEDIA_ROOT, path,
+                     settings.MEDIA_MAX_AGE, immutable=True)
+    return serve(request, 'media', settings.MEDIA_ROOT, path,
+                 settings.MEDIA_UNHASHED_MAX_AGE)
@@ -0,0 +1,183 @@
+"""Журнал медленных SQL-запросов с планами выполнения.
+
+Медленные запросы копятся в памяти потока и записываются в SlowQuery
+после отправки ответа (request_finished), каждый в своей короткой
+транзакции: запись посреди запроса добавила бы блокировок БД как раз
+тогда, когда она тормозит, и пропала бы при откате транзакции запроса.
+Запросы из потоков пула async view (core.asyncviews) копятся в
+RequestRecorder запроса и записываются вместе с остальными.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core import instrumentation, object_cache, query_cache
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+# Сколько медленных запросов одного запроса к сайту ждут записи.
+MAX_PENDING = 100
+
+Pending = namedtuple('Pending', 'alias sql params duration view location')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL без литералов и с одним плейсхолдером на список IN."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()
+
+
+_SKIPPED_FILES = (__file__, instrumentation.__file__, object_cache.__file__,
+                  query_cache.__file__)
+_SKIPPED_DIRS = tuple(os.path.join(os.path.dirname(__file__), name)
+                      for name in ('middleware', 'backends'))
+
+
+def caller_location():
+    """Последний кадр стека из кода проекта, не считая инструментов."""
+    for frame in reversed(traceback.extract_stack()):
+        if (frame.filename.startswith(settings.BASE_DIR)
+                and frame.filename not in _SKIPPED_FILES
+                and not frame.filename.startswith(_SKIPPED_DIRS)):
+            path = frame.filename[len(settings.BASE_DIR) + 1:]
+            return f'{path}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(' '.join(str(column) for column in row)
+                         for row in cursor.fetchall())
+
+
+def record(connection, sql, params, duration, view='', location=''):
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    updated = SlowQuery.objects.filter(fingerprint=key).update(
+        count=F('count') + 1,
+        total_time=F('total_time') + duration,
+        max_time=Greatest('max_time', Value(duration)),
+        # auto_now при update() не срабатывает.
+        last_seen=timezone.now(),
+    )
+    plan = ''
+    if not updated:
+        plan = explain(connection, sql, params)
+        SlowQuery.objects.create(
+            fingerprint=key,
+            sql=normalized,
+            example_params=repr(params),
+            view=view,
+            location=location,
+            plan=plan,
+            count=1,
+            total_time=duration,
+            max_time=duration,
+        )
+    logger.warning('Медленный запрос %.1f мс (%s, %s): %s; параметры %r%s',
+                   duration * 1000, view, location, sql, params,
+                   f'\n{plan}' if plan else '')
+
+
+def _collect(pending, request, execute, sql, params, many, context):
+    if getattr(_local, 'recording', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if (duration >= settings.SLOW_QUERY_THRESHOLD and not many
+            and len(pending) < MAX_PENDING):
+        pending.append(Pending(
+            context['connection'].alias, sql, params, duration,
+            instrumentation.view_name(request) if request else '',
+            caller_location()))
+    return result
+
+
+def wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper; записывает flush()."""
+    return _collect(_pending(), None, execute, sql, params, many, context)
+
+
+class RequestRecorder:
+    """Обёртка execute_wrapper для одного запроса к сайту.
+
+    Общий список нужен потокам пула async view, которые применяют
+    обёртки запроса к своим соединениям.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.pending = []
+
+    def __call__(self, execute, sql, params, many, context):
+        return _collect(self.pending, self.request, execute, sql, params,
+                        many, context)
+
+    def finish(self):
+        """Передаёт накопленное на запись после ответа (request_finished)."""
+        pending = _pending()
+        pending.extend(self.pending[:MAX_PENDING - len(pending)])
+        self.pending = []
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = []
+    return _local.pending
+
+
+def flush():
+    """Записывает накопленные медленные запросы этого потока."""
+    pending, _local.pending = _pending(), []
+    _local.recording = True
+    try:
+        for entry in pending:
+            try:
+                with transaction.atomic(using=entry.alias):
+                    record(connections[entry.alias], entry.sql,
+                           entry.params, entry.duration, entry.view,
+                           entry.location)
+            except Exception:
+                logger.exception('Не удалось записать медленный запрос')
+    finally:
+        _local.recording = False
+
+
+def _flush_after_response(**kwargs):
+    if getattr(_local, 'pending', None):
+        flush()
+
+
+request_finished.connect(_flush_after_response)
@@ -0,0 +1,87 @@
+"""Ответы Server-Sent Events для ASGI-приложений."""
+import asyncio
+import json
+
+from core import metrics
+
+CONNECTIONS = metrics.Gauge(
+    'sse_connections',
+    'Открытые соединения Server-Sent Events',
+)
+EVENTS = metrics.Counter(
+    'sse_events_total',
+    'Отправленные события Server-Sent Events',
+)
+
+
+def event(data, name=None, event_id=None):
+    """Событие в формате text/event-stream; data сериализуется в JSON."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if name is not None:
+        lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def respond(send, status, text):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type',
+                             b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': text.encode()})
+
+
+async def _disconnected(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def stream(receive, send, subscription, initial=(), retry=5000,
+                 heartbeat=15, to_event=None):
+    """Отправляет события подписки, пока клиент не отключится.
+
+    initial — уже готовые события, например пропущенные до
+    переподключения; to_event превращает (канал, сообщение) в байты
+    события. Раз в heartbeat секунд без событий отправляется
+    комментарий, чтобы прокси не закрывали соединение.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            # nginx не должен буферизовать поток.
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    CONNECTIONS.inc()
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+    try:
+        body = f'retry: {retry}\n\n'.encode() + b''.join(initial)
+        await send({'type': 'http.response.body', 'body': body,
+                    'more_body': True})
+        EVENTS.inc(len(initial))
+        while not disconnected.done():
+            getter = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                (getter, disconnected), timeout=heartbeat,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                getter.cancel()
+                break
+            if getter in done:
+                body = to_event(*getter.result())
+                EVENTS.inc()
+            else:
+                getter.cancel()
+                body = b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body,
+                        'more_body': True})
+    finally:
+        disconnected.cancel()
+        subscription.close()
+        CONNECTIONS.dec()
@@ -0,0 +1,128 @@
+"""Хранилища файлов с именами по хешу содержимого.
+
+Одинаковые медиафайлы хранятся один раз. Ссылки на файл считаются
+в StoredFile: acquire() добавляет ссылку, release() убирает её
+и удаляет файл, на который больше никто не ссылается.
+
+Статика собирается с хешем в имени и сжатыми копиями рядом.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from . import compression
+from .models import StoredFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файл сохраняется как <каталог>/<xx>/<sha256><расширение>."""
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), digest[:2],
+                              digest + extension)
+
+    def save(self, name, content, max_length=None):
+        """Сохраняет файл и сразу берёт на него ссылку.
+
+        Ссылка берётся до проверки файла: иначе параллельный release()
+        мог бы удалить уже найденный файл до acquire().
+        """
+        if name is None:
+            name = content.name
+        name = self.content_name(name, content)
+        self.acquire(name)
+        if not self.exists(name):
+            saved = super().save(name, content, max_length)
+            if saved != name:
+                # Тот же файл одновременно записал другой запрос.
+                self.delete(saved)
+        return name
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл."""
+        updated = StoredFile.objects.filter(name=name).update(
+            references=F('references') + 1)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=1)
+        except IntegrityError:
+            StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1)
+
+    def release(self, name):
+        """Убирает ссылку; True, если файл остался без ссылок и удалён.
+
+        Файлы без записи в StoredFile, сохранённые до подсчёта ссылок,
+        не удаляются.
+        """
+        with transaction.atomic():
+            StoredFile.objects.filter(name=name, references__gt=0).update(
+                references=F('references') - 1)
+            deleted, _ = StoredFile.objects.filter(
+                name=name, references=0).delete()
+            if not deleted:
+                return False
+            # Файл удаляется до коммита: acquire() того же имени ждёт
+            # блокировку строки и после неё записывает файл заново.
+            self.delete(name)
+        return True
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и копиями .gz и .br, созданными при
+    collectstatic.
+
+    Файлы, которых ещё нет в манифесте, например до первого
+    collectstatic, отдаются под исходным именем.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            self.compress(name)
+            hashed_name = self.hashed_files.get(self.hash_key(name))
+            if hashed_name:
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        """Сохраняет сжатые копии, если они заметно меньше файла."""
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in settings.STATIC_COMPRESS_EXTENSIONS:
+            return
+        with self.open(name) as static_file:
+            data = static_file.read()
+        if len(data) < settings.STATIC_COMPRESS_MIN_SIZE:
+            return
+        for encoding in compression.encodings():
+            compressed = compression.compress(data, encoding)
+            compressed_name = name + compression.SUFFIXES[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            if len(compressed) < len(data) * 0.95:
+                self._save(compressed_name, ContentFile(compressed))
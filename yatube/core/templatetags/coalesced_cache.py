@@ -0,0 +1,29 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags import cache as cache_tags
+
+from core.coalesce import get_or_compute
+
+register = template.Library()
+
+
+class CoalescedCacheNode(cache_tags.CacheNode):
+    def render(self, context):
+        try:
+            timeout = int(self.expire_time_var.resolve(context))
+        except (template.VariableDoesNotExist, ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"cache" tag got a non-integer timeout value')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_compute(key, lambda: self.nodelist.render(context),
+                              timeout, name=self.fragment_name)
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Тег {% cache %} Django с защитой от одновременного пересчёта"""
+    node = cache_tags.do_cache(parser, token)
+    return CoalescedCacheNode(node.nodelist, node.expire_time_var,
+                              node.fragment_name, node.vary_on,
+                              node.cache_name)
@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .. import admission
+
+User = get_user_model()
+
+
+class GateTest(SimpleTestCase):
+    def test_sheds_when_queue_is_full(self):
+        """Без места в очереди запрос сразу отклоняется"""
+        gate = admission.Gate('test', limit=1, queue_size=0, timeout=1)
+        self.assertTrue(gate.acquire())
+        started = time.perf_counter()
+        self.assertFalse(gate.acquire())
+        self.assertLess(time.perf_counter() - started, 0.5)
+        gate.release()
+        self.assertTrue(gate.acquire())
+
+    def test_queue_timeout(self):
+        """Запрос в очереди отклоняется по таймауту"""
+        gate = admission.Gate('test', limit=1, queue_size=1, timeout=0.05)
+        gate.acquire()
+        self.assertFalse(gate.acquire())
+        self.assertEqual(gate.waiting, 0)
+
+    def test_priority_requests_enter_first(self):
+        """Освободившееся место достаётся приоритетному запросу"""
+        gate = admission.Gate('test', limit=1, queue_size=5, timeout=2)
+        gate.acquire()
+        order = []
+
+        def enter(name, priority):
+            if gate.acquire(priority):
+                order.append(name)
+                gate.release()
+
+        regular = threading.Thread(target=enter, args=('regular', False))
+        regular.start()
+        while not gate.waiting:
+            time.sleep(0.001)
+        priority = threading.Thread(target=enter, args=('priority', True))
+        priority.start()
+        while not gate.waiting_priority:
+            time.sleep(0.001)
+        gate.release()
+        regular.join()
+        priority.join()
+        self.assertEqual(order, ['priority', 'regular'])
+
+    def test_priority_queue_is_bounded(self):
+        """У приоритетных запросов своя ограниченная очередь"""
+        gate = admission.Gate('test', limit=1, queue_size=5, timeout=1,
+                              priority_queue_size=0)
+        gate.acquire()
+        started = time.perf_counter()
+        self.assertFalse(gate.acquire(priority=True))
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+
+class AdmissionMiddlewareTest(TestCase):
+    def setUp(self):
+        admission.reset()
+        self.user = User.objects.create_user(username='user')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        admission.reset()
+
+    def test_saturated_class_returns_503(self):
+        """Перегруженный класс маршрутов отвечает 503 с Retry-After"""
+        gate = admission.get_gate('feeds')
+        for _ in range(gate.limit):
+            gate.acquire()
+        gate.queue_size = 0
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.has_header('Retry-After'))
+        response = self.client.get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_slot_released_after_response(self):
+        """После ответа место в классе освобождается"""
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(admission.get_gate('feeds').in_flight, 0)
+
+    def priority_of(self, **headers):
+        with mock.patch.object(admission.Gate, 'acquire',
+                               return_value=True) as acquire:
+            self.client.post(reverse('api:post-list'), **headers)
+        return acquire.call_args[0][0]
+
+    def test_authorization_header_alone_is_not_priority(self):
+        """Произвольный Authorization не даёт приоритета"""
+        self.client.logout()
+        self.assertFalse(self.priority_of(HTTP_AUTHORIZATION='x'))
+        self.assertFalse(
+            self.priority_of(HTTP_AUTHORIZATION='Bearer invalid'))
+
+    def test_valid_token_is_priority(self):
+        """Запись с действующим JWT входит в первую очередь"""
+        self.client.logout()
+        token = AccessToken.for_user(self.user)
+        self.assertTrue(
+            self.priority_of(HTTP_AUTHORIZATION=f'Bearer {token}'))
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .. import coalesce
+
+
+@override_settings(CACHE_STALE_TTL=60, CACHE_FILL_LOCK_TIMEOUT=5,
+                   CACHE_FILL_POLL_INTERVAL=0.01)
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return f'значение {self.calls}'
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременный промах пересчитывается одним потоком"""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                coalesce.get_or_compute('key', self.compute, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение 1'] * 8)
+
+    def test_stale_value_served_while_recomputing(self):
+        """Пока идёт пересчёт, остальные получают устаревшее значение"""
+        cache.set('key', ('старое', time.time() - 1, 0.01), 60)
+        cache.add('key:fill-lock', 1, 5)
+        value = coalesce.get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_value_recomputed(self):
+        """Устаревшее значение пересчитывается, если никто не занят"""
+        cache.set('key', ('старое', time.time() - 1, 0.01), 60)
+        self.assertEqual(coalesce.get_or_compute('key', self.compute, 60),
+                         'значение 1')
+        self.assertEqual(coalesce.get_or_compute('key', self.compute, 60),
+                         'значение 1')
+
+    def test_early_refresh_near_expiry(self):
+        """Перед самым сроком значение пересчитывается заранее"""
+        cache.set('key', ('старое', time.time() + 0.001, 10), 60)
+        self.assertEqual(coalesce.get_or_compute('key', self.compute, 60),
+                         'значение 1')
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from posts.models import Group, Post
+from .. import codecs
+
+User = get_user_model()
+
+
+class ZlibCodecTest(SimpleTestCase):
+    def test_compresses_above_threshold(self):
+        """Длинные значения сжимаются, короткие хранятся как есть"""
+        codec = codecs.ZlibCodec(min_length=100)
+        for value, flag in (('коротко', codec.RAW),
+                            ('<p>карточка</p>' * 100, codec.COMPRESSED)):
+            with self.subTest(flag=flag):
+                data = codec.encode(value)
+                self.assertEqual(data[:1], flag)
+                self.assertEqual(codec.decode(data), value)
+        self.assertLess(len(codec.encode('<p>карточка</p>' * 100)), 100)
+
+    def test_cache_backend_uses_codec(self):
+        """Кеш хранит значения закодированными, а числа — как есть"""
+        self.assertIsInstance(cache.codec, codecs.ZlibCodec)
+        cache.set('codec-test', {'html': 'x' * 5000})
+        self.assertEqual(cache.get('codec-test'), {'html': 'x' * 5000})
+        cache.set('codec-counter', 1)
+        self.assertEqual(cache.incr('codec-counter'), 2)
+        self.assertEqual(cache.get_many(['codec-test', 'codec-counter']),
+                         {'codec-test': {'html': 'x' * 5000},
+                          'codec-counter': 2})
+
+
+class RecordsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.create(text='С группой', author=cls.user,
+                            group=cls.group)
+        Post.objects.create(text='Без группы', author=cls.user)
+
+    def test_round_trip_with_related(self):
+        """Записи восстанавливаются в объекты вместе с select_related"""
+        posts = list(Post.objects.select_related('group'))
+        records = codecs.to_records(posts)
+        self.assertIsInstance(records, codecs.Records)
+        with self.assertNumQueries(0):
+            restored = codecs.from_records(records)
+            self.assertEqual([post.text for post in restored],
+                             [post.text for post in posts])
+            self.assertEqual(restored[1].group.slug, 'group')
+            self.assertIsNone(restored[0].group)
+        self.assertFalse(restored[0]._state.adding)
+
+    def test_deferred_objects_kept(self):
+        """Неполные объекты и не модели остаются как есть"""
+        posts = list(Post.objects.only('text'))
+        self.assertIs(codecs.to_records(posts), posts)
+        self.assertEqual(codecs.to_records([1, 2]), [1, 2])
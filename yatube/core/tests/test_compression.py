@@ -0,0 +1,108 @@
+import gzip
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from .. import compression
+from ..middleware.compression import RESPONSES, CompressionMiddleware
+
+User = get_user_model()
+
+HTML = '<p>Текст поста</p>\n' * 200
+
+
+class AcceptEncodingTest(SimpleTestCase):
+    def test_accepted(self):
+        """Учитываются только поддерживаемые способы и q=0"""
+        self.assertEqual(compression.accepted('gzip, deflate', ('gzip',)),
+                         ['gzip'])
+        self.assertEqual(compression.accepted('gzip;q=0, *', ('gzip',)), [])
+        self.assertEqual(compression.accepted('br', ('br', 'gzip')), ['br'])
+        self.assertEqual(compression.accepted('identity', ('gzip',)), [])
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    def process(self, response, accept='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_html(self):
+        response = self.process(HttpResponse(HTML))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gzip.decompress(response.content).decode(), HTML)
+
+    def test_streaming_compressed_incrementally(self):
+        """Каждая часть потока сжимается и отдаётся сразу"""
+        chunks = [HTML.encode()[:1000], HTML.encode()[1000:]]
+        response = self.process(StreamingHttpResponse(iter(chunks)))
+        self.assertFalse(response.has_header('Content-Length'))
+        decompressor = zlib.decompressobj(31)
+        first = next(iter(response.streaming_content))
+        self.assertEqual(decompressor.decompress(first), chunks[0])
+        rest = b''.join(response.streaming_content)
+        self.assertEqual(decompressor.decompress(rest), chunks[1])
+
+    def test_skipped(self):
+        """Маленькие, уже сжатые и несжимаемые ответы не трогаются"""
+        small = self.process(HttpResponse('<p>мало</p>'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        image = self.process(HttpResponse(b'x' * 2000,
+                                          content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+        encoded = HttpResponse(HTML)
+        encoded['Content-Encoding'] = 'br'
+        self.assertEqual(self.process(encoded).content, HTML.encode())
+        plain = self.process(HttpResponse(HTML), accept='identity')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_weak_etag(self):
+        response = HttpResponse(HTML)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.process(response)['ETag'], 'W/"abc"')
+
+
+class PageCacheReuseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='user')
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i} ' * 20, author=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_sent_without_recompression(self):
+        """Сжатое тело из кеша страниц отдаётся без повторного сжатия"""
+        key = ('http_compression_responses_total',
+               'http_compression_responses_total',
+               (('view', 'posts:index'), ('encoding', 'gzip'),
+                ('result', 'reused')))
+        before = RESPONSES.registry.collect().get(key, 0)
+        plain = self.client.get(reverse('posts:index'))
+        first = self.client.get(reverse('posts:index'),
+                                HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['X-Page-Cache'], 'hit')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(first.content), plain.content)
+        self.assertEqual(RESPONSES.registry.collect()[key], before + 1)
+
+    def test_pages_with_secrets_not_compressed(self):
+        """Страницы вошедших и с токеном CSRF не сжимаются (BREACH)"""
+        self.client.force_login(User.objects.get(username='user'))
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.client.logout()
+        response = self.client.get(reverse('users:login'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertFalse(response.has_header('Content-Encoding'))
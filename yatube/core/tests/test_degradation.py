@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api import throttling
+from api.views import PostViewSet
+from posts.models import Post
+from ..circuit_breaker import breaker
+
+User = get_user_model()
+
+DATABASE_LOCKED = OperationalError('database is locked')
+
+
+@override_settings(DB_BREAKER_FAILURE_THRESHOLD=1, DB_BREAKER_COOLDOWN=60)
+class DegradationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        breaker.reset()
+        throttling.reset()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:profile', args=(self.user,))
+
+    def tearDown(self):
+        breaker.reset()
+
+    def test_database_error_serves_last_good_response(self):
+        """При ошибке БД отдаётся последний удачный ответ"""
+        good = self.client.get(self.url)
+        with mock.patch('posts.views.paginator',
+                        side_effect=DATABASE_LOCKED):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Stale'], '1')
+        self.assertEqual(response.content, good.content)
+        self.assertTrue(breaker.is_open)
+
+    def test_failed_user_lookup_serves_last_good_response(self):
+        """Ошибка БД при загрузке пользователя тоже даёт старый ответ"""
+        good = self.client.get(self.url)
+        with mock.patch('django.contrib.auth.backends.ModelBackend.get_user',
+                        side_effect=DATABASE_LOCKED) as get_user:
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Stale'], '1')
+            self.assertEqual(response.content, good.content)
+            self.assertTrue(breaker.is_open)
+            get_user.reset_mock()
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Stale'], '1')
+            get_user.assert_not_called()
+
+    def test_open_breaker_skips_view(self):
+        """Разомкнутый предохранитель не пускает запросы к view"""
+        self.client.get(self.url)
+        breaker.record_failure()
+        with mock.patch('posts.views.paginator') as paginator:
+            response = self.client.get(self.url)
+            paginator.assert_not_called()
+        self.assertEqual(response['X-Stale'], '1')
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.has_header('Retry-After'))
+
+    @override_settings(DB_BREAKER_COOLDOWN=0)
+    def test_recovers_after_successful_probe(self):
+        """После удачного пробного запроса предохранитель замыкается"""
+        breaker.record_failure()
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('X-Stale'))
+        self.assertFalse(breaker.is_open)
+
+    @override_settings(DB_BREAKER_COOLDOWN=0)
+    def test_failed_probe_keeps_breaker_open(self):
+        """Неудачный пробный запрос оставляет предохранитель разомкнутым"""
+        breaker.record_failure()
+        with mock.patch.object(breaker, 'probe', return_value=False):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(breaker.is_open)
+
+    def test_api_serves_last_good_response(self):
+        """API постов тоже отдаёт последний удачный ответ"""
+        self.client.logout()
+        url = reverse('api:post-list')
+        good = self.client.get(url)
+        with mock.patch.object(PostViewSet, 'list',
+                               side_effect=DATABASE_LOCKED):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Stale'], '1')
+        self.assertEqual(response.content, good.content)
+        self.assertTrue(breaker.is_open)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from .. import instrumentation
+
+User = get_user_model()
+
+
+class InstrumentationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset()
+
+    def test_server_timing_header(self):
+        """Ответ содержит заголовок Server-Timing со всеми метриками"""
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'cache;desc=', 'tpl;dur=',
+                       'thumb;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+
+    def test_stats_aggregated_by_view_name(self):
+        """Счётчики суммируются по имени view"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile', args=(self.user,)))
+        stats = instrumentation.view_stats()
+        self.assertEqual(stats['posts:index']['requests'], 2)
+        self.assertEqual(stats['posts:profile']['requests'], 1)
+        self.assertGreater(stats['posts:profile']['queries'], 0)
+        self.assertGreater(stats['posts:index']['template_time'], 0)
+
+    def test_cache_hits_and_misses(self):
+        """Фрагментный кеш главной: сначала промах, затем попадание"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        stats = instrumentation.view_stats()['posts:index']
+        self.assertGreaterEqual(stats['cache_misses'], 1)
+        self.assertGreaterEqual(stats['cache_hits'], 1)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        """Выключенная middleware не добавляет заголовок"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(instrumentation.view_stats(), {})
@@ -0,0 +1,128 @@
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+User = get_user_model()
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = metrics.Registry(directory=self.directory)
+        self.counter = metrics.Counter(
+            'test_total', 'Тестовый счётчик', ('view',),
+            registry=self.registry)
+        self.histogram = metrics.Histogram(
+            'test_seconds', 'Тестовая гистограмма', ('view',),
+            buckets=(0.1, 1), registry=self.registry)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы выдаются накопленными"""
+        for value in (0.05, 0.5, 5):
+            self.histogram.observe(value, view='posts:index')
+        text = self.registry.generate_latest()
+        self.assertIn(
+            'test_seconds_bucket{view="posts:index",le="0.1"} 1', text)
+        self.assertIn(
+            'test_seconds_bucket{view="posts:index",le="1"} 2', text)
+        self.assertIn(
+            'test_seconds_bucket{view="posts:index",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{view="posts:index"} 3', text)
+        self.assertIn('# TYPE test_seconds histogram', text)
+
+    def test_values_summed_across_processes(self):
+        """Файлы разных процессов складываются"""
+        self.counter.inc(view='posts:index')
+        other_process = metrics.MmapStore(f'{self.directory}/other.db')
+        other_process.inc(
+            ('test_total', 'test_total', (('view', 'posts:index'),)), 2)
+        self.assertIn('test_total{view="posts:index"} 3',
+                      self.registry.generate_latest())
+
+    def test_dead_process_gauges_dropped(self):
+        """Gauge завершившегося процесса не выдаются, счётчики остаются"""
+        gauge = metrics.Gauge('test_in_progress', 'Тестовый gauge',
+                              registry=self.registry)
+        gauge.inc()
+        dead_process = metrics.MmapStore(f'{self.directory}/99999991.db')
+        dead_process.inc(('test_in_progress', 'test_in_progress', ()), 5)
+        dead_process.inc(
+            ('test_total', 'test_total', (('view', 'posts:index'),)), 2)
+        text = self.registry.generate_latest()
+        self.assertIn('test_in_progress 1\n', text)
+        self.assertIn('test_total{view="posts:index"} 2', text)
+
+    def test_clear_directory(self):
+        """Очистка удаляет файлы процессов прошлого запуска"""
+        metrics.MmapStore(f'{self.directory}/99999991.db').inc(
+            ('test_total', 'test_total', (('view', 'posts:index'),)), 2)
+        with override_settings(METRICS_DIR=self.directory):
+            call_command('clear_metrics', stdout=io.StringIO())
+        self.assertNotIn('test_total{view="posts:index"}',
+                         self.registry.generate_latest())
+
+    def test_store_grows(self):
+        """Хранилище расширяет файл, когда место кончается"""
+        store = metrics.MmapStore(f'{self.directory}/grow.db')
+        keys = [('grow', 'grow', (('n', str(i)),)) for i in range(3000)]
+        for key in keys:
+            store.inc(key, 1)
+        values = metrics.read_file(f'{self.directory}/grow.db')
+        self.assertEqual(len(values), len(keys))
+        self.assertEqual(values[keys[-1]], 1)
+
+    def test_unknown_labels(self):
+        """Метки должны совпадать с объявленными"""
+        with self.assertRaises(ValueError):
+            self.counter.inc(status=200)
+
+
+class MetricsViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+
+    def test_forbidden_for_regular_users(self):
+        """Метрики недоступны анонимам и обычным пользователям"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         403)
+
+    def test_staff_sees_request_metrics(self):
+        """Staff видит время ответов и коды статусов по view"""
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{view="posts:index"}', text)
+        self.assertIn(
+            'http_responses_total{view="posts:index",status="200"}', text)
+        self.assertIn('http_request_db_seconds_sum{view="posts:index"}',
+                      text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_access(self):
+        """Сборщик проходит по токену"""
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
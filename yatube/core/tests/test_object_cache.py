@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from posts.models import Group, Post, cached_users
+from ..object_cache import get_cached_or_404
+
+User = get_user_model()
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookup_by_pk_and_secondary_keys(self):
+        """Повторный поиск по pk, slug и username не обращается к БД"""
+        lookups = (
+            (Post.objects, {'pk': self.post.pk}),
+            (Group.objects, {'slug': 'group'}),
+            (cached_users, {'username': 'author'}),
+        )
+        for source, lookup in lookups:
+            with self.subTest(lookup=lookup):
+                first = source.get_cached(**lookup)
+                with self.assertNumQueries(0):
+                    second = source.get_cached(**lookup)
+                self.assertEqual(first, second)
+
+    def test_users_cached_without_private_fields(self):
+        """В кеше пользователя нет пароля и почты"""
+        cached_users.get_cached(username='author')
+        cached = cache.get(cached_users._key('pk', self.user.pk))
+        self.assertEqual(cached.username, 'author')
+        self.assertTrue({'password', 'email', 'is_superuser'}
+                        <= cached.get_deferred_fields())
+
+    def test_invalidated_on_save(self):
+        """Сохранение объекта сбрасывает его запись в кеше"""
+        Group.objects.get_cached(slug='group')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertEqual(
+            Group.objects.get_cached(slug='renamed').slug, 'renamed')
+        with self.assertRaises(Group.DoesNotExist):
+            Group.objects.get_cached(slug='group')
+
+    def test_invalidated_on_delete(self):
+        """Удалённый объект не находится в кеше"""
+        post = Post.objects.create(text='Удалить', author=self.user)
+        Post.objects.get_cached(pk=post.pk)
+        pk = post.pk
+        post.delete()
+        with self.assertRaises(Http404):
+            get_cached_or_404(Post.objects, pk=pk)
+
+    def test_invalidated_on_version_bump(self):
+        """Изменение группы сбрасывает посты с новой версией"""
+        version = Post.objects.get_cached(pk=self.post.pk).version
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertEqual(Post.objects.get_cached(pk=self.post.pk).version,
+                         version + 1)
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from .. import page_cache
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_cached(self):
+        """Анонимы получают сохранённые страницы"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                first = self.client.get(page)
+                second = self.client.get(page)
+                self.assertEqual(first['X-Page-Cache'], 'miss')
+                self.assertEqual(second['X-Page-Cache'], 'hit')
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['Content-Type'],
+                                 second['Content-Type'])
+
+    def test_content_change_invalidates_pages(self):
+        """Новый комментарий сбрасывает сохранённые страницы"""
+        page = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(page)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Новый комментарий')
+        response = self.client.get(page)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_authenticated_users_bypass_cache(self):
+        """Страницы пользователей с сессией не кешируются"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_hit_metrics(self):
+        """Попадания считаются в метриках"""
+        key = ('page_cache_requests_total', 'page_cache_requests_total',
+               (('view', 'posts:index'), ('result', 'hit')))
+        hits_before = page_cache.REQUESTS.registry.collect().get(key, 0)
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(page_cache.REQUESTS.registry.collect()[key],
+                         hits_before + 1)
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+TEMP_PROFILING_DIR = tempfile.mkdtemp()
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_DIR=TEMP_PROFILING_DIR,
+                   PROFILING_INTERVAL=0.001)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILING_DIR, ignore_errors=True)
+
+    def tearDown(self):
+        for name in os.listdir(TEMP_PROFILING_DIR):
+            os.remove(os.path.join(TEMP_PROFILING_DIR, name))
+
+    def test_staff_can_request_profile(self):
+        """Staff получает профиль по параметру и по заголовку"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('posts:index'), {'profile': 1})
+        self.assertTrue(response.has_header('X-Profile-Id'))
+        response = self.client.get(reverse('posts:follow_index'),
+                                   HTTP_X_PROFILE='1')
+        name = response['X-Profile-Id']
+        with open(os.path.join(TEMP_PROFILING_DIR, name)) as file:
+            profile = json.load(file)
+        self.assertEqual(profile['view'], 'posts:follow_index')
+        self.assertEqual(profile['status'], 200)
+        self.assertGreater(profile['duration'], 0)
+
+    def test_regular_user_is_not_profiled(self):
+        """Обычный пользователь не может включить профилирование"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'), {'profile': 1})
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(TEMP_PROFILING_DIR), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests_are_profiled(self):
+        """Запросы из случайной выборки профилируются"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('X-Profile-Id'))
+
+    def test_collapse_command(self):
+        """Команда суммирует стеки профилей выбранной view"""
+        for view, stacks in (
+                ('posts:follow_index', {'a;b': 2, 'a;c': 1}),
+                ('posts:follow_index', {'a;b': 3}),
+                ('posts:index', {'a;d': 5})):
+            with open(os.path.join(TEMP_PROFILING_DIR,
+                                   f'{view}{len(stacks)}.json'),
+                      'w') as file:
+                json.dump({'view': view, 'stacks': stacks}, file)
+        out = StringIO()
+        call_command('profiles', view='posts:follow_index', collapse=True,
+                     stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['a;b 5', 'a;c 1'])
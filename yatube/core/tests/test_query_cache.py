@@ -0,0 +1,98 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+from .. import query_cache
+
+User = get_user_model()
+
+
+class QueryCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.create(text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_cached(self):
+        """Повторный запрос и count() берутся из кеша"""
+        list(self.group.posts.cached())
+        self.group.posts.cached().count()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.group.posts.cached()), 1)
+            self.assertEqual(self.group.posts.cached().count(), 1)
+
+    def test_write_bumps_table_version(self):
+        """Запись в таблицу сбрасывает результаты запросов к ней"""
+        follows = Follow.objects.filter(user=self.user)
+        self.assertEqual(len(follows.cached()), 0)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(len(follows.cached()), 1)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(len(follows.cached()), 0)
+
+    def test_bulk_update_bumps_version(self):
+        """Изменение через update() тоже меняет версию таблицы"""
+        self.assertEqual(self.group.posts.cached()[0].text, 'Пост')
+        Post.objects.update(text='Новый текст')
+        self.assertEqual(self.group.posts.cached()[0].text, 'Новый текст')
+
+    def test_subquery_tables_versioned(self):
+        """Таблицы подзапросов тоже входят в ключ"""
+        posts = Post.objects.filter(
+            author__in=Follow.objects.filter(user=self.user).values('author'))
+        self.assertEqual(len(posts.cached()), 0)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(len(posts.cached()), 1)
+
+    def test_unknown_tables_not_cached(self):
+        """Запросы к таблицам вне QUERY_CACHE_TABLES не кешируются"""
+        with self.settings(QUERY_CACHE_TABLES=('posts_group',)):
+            list(Post.objects.cached())
+            with self.assertNumQueries(1):
+                list(Post.objects.cached())
+        self.assertEqual(query_cache.query_tables(
+            str(Post.objects.select_related('group').query)),
+            ['posts_group', 'posts_post'])
+
+
+class WriteWatcherTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+
+    def test_watcher_kept_when_connection_opens_in_request(self):
+        """Соединение, открытое внутри запроса, следит за записями"""
+        counts = []
+
+        def serve():
+            # В новом потоке своё соединение, и оно открывается под
+            # обёртками middleware запроса.
+            try:
+                with mock.patch.dict(connection.settings_dict,
+                                     CONN_MAX_AGE=600):
+                    for _ in range(3):
+                        self.client.get(reverse('posts:index'))
+                    Post.objects.create(text='Первый', author=self.author)
+                    counts.append(Post.objects.cached().count())
+                    Post.objects.create(text='Второй', author=self.author)
+                    counts.append(Post.objects.cached().count())
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        thread.join()
+        self.assertEqual(counts, [1, 2])
@@ -0,0 +1,144 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import serving
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_DIR, 'source')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'static')
+MEDIA_ROOT = os.path.join(TEMP_DIR, 'media')
+
+CSS = 'body { color: red; }\n' * 100
+DIGEST = 'ab' + '0' * 62
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    MEDIA_ROOT=MEDIA_ROOT,
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder'],
+)
+class ServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'site.css'), 'w') as css:
+            css.write(CSS)
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'))
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'file.bin'), 'wb') as f:
+            f.write(bytes(range(100)))
+        for name in (f'posts/ab/{DIGEST}.jpg',
+                     f'posts/variants/{DIGEST}_480x170.webp',
+                     'posts/variants/photo_480x170.webp',
+                     'cache/12/34/1234.jpg'):
+            os.makedirs(os.path.join(MEDIA_ROOT, os.path.dirname(name)),
+                        exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(b'image')
+        with override_settings(STATIC_ROOT=STATIC_ROOT,
+                               STATICFILES_DIRS=[SOURCE_DIR]):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic сохраняет имена с хешем и сжатые копии"""
+        hashed = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(
+            os.path.join(STATIC_ROOT, hashed + '.gz')))
+        self.assertEqual(staticfiles_storage.stored_name('img/none.png'),
+                         'img/none.png')
+
+    def test_precompressed_static(self):
+        """Сжатая копия отдаётся клиенту, который её принимает"""
+        hashed = staticfiles_storage.stored_name('css/site.css')
+        response = self.client.get(f'/static/{hashed}',
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), CSS)
+        response.close()
+        response = self.client.get('/static/css/site.css',
+                                   HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+    def test_range_requests(self):
+        """Диапазоны отдаются с кодом 206, вне файла — 416"""
+        response = self.client.get('/media/posts/file.bin',
+                                   HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content),
+                         bytes(range(10, 20)))
+        response = self.client.get('/media/posts/file.bin',
+                                   HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content),
+                         bytes(range(95, 100)))
+        response = self.client.get('/media/posts/file.bin',
+                                   HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_parse_range(self):
+        self.assertEqual(serving.parse_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(serving.parse_range('bytes=0-100', 10), (0, 9))
+        self.assertIsNone(serving.parse_range('bytes=0-1,3-4', 10))
+        with self.assertRaises(ValueError):
+            serving.parse_range('bytes=5-2', 10)
+
+    @override_settings(SENDFILE_BACKEND='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """С X-Accel-Redirect тело ответа отправляет nginx"""
+        response = self.client.get('/media/posts/file.bin')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/internal/media/posts/file.bin')
+        self.assertEqual(response.content, b'')
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+    @override_settings(SENDFILE_BACKEND='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get('/media/posts/file.bin')
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(MEDIA_ROOT, 'posts', 'file.bin'))
+
+    def test_media_cache_control(self):
+        """immutable только у медиафайлов с именем по хешу содержимого"""
+        names = {
+            f'posts/ab/{DIGEST}.jpg': True,
+            f'posts/variants/{DIGEST}_480x170.webp': True,
+            'posts/variants/photo_480x170.webp': False,
+            'cache/12/34/1234.jpg': False,
+            'posts/file.bin': False,
+        }
+        for name, immutable in names.items():
+            with self.subTest(name=name):
+                response = self.client.get(f'/media/{name}')
+                self.assertEqual(
+                    response['Cache-Control'],
+                    'public, max-age=31536000, immutable' if immutable
+                    else 'public, max-age=3600')
+                response.close()
+
+    def test_outside_root_not_served(self):
+        response = self.client.get('/media/../../settings.py')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/media/posts/missing.bin')
+        self.assertEqual(response.status_code, 404)
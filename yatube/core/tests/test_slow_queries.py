@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post
+from ..models import SlowQuery
+from .. import slow_queries
+from ..slow_queries import normalize
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0)
+class SlowQueryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user
+        )
+
+    def test_normalize(self):
+        """Литералы и списки IN заменяются плейсхолдерами"""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x'  AND b IN (%s, %s) "
+                      "LIMIT 10"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?'
+        )
+        self.assertEqual(normalize('SELECT 1 WHERE id IN (%s)'),
+                         normalize('SELECT 2 WHERE id IN (%s, %s, %s)'))
+
+    def test_queries_deduplicated_with_plan(self):
+        """Запросы группируются по отпечатку, план сохраняется"""
+        self.client.force_login(self.user)
+        queries = SlowQuery.objects.filter(
+            sql__contains='FROM "posts_comment"',
+            view='posts:post_detail',
+        )
+        self.client.get(reverse('posts:post_detail', args=(self.post.pk,)))
+        count_after_first_request = queries.get().count
+        self.client.get(reverse('posts:post_detail', args=(self.post.pk,)))
+        query = queries.get()
+        self.assertEqual(query.count, count_after_first_request * 2)
+        self.assertGreaterEqual(query.total_time, query.max_time)
+        self.assertTrue(query.plan)
+        self.assertIn('posts/views.py', query.location)
+
+    def test_written_after_request_despite_rollback(self):
+        """Запись идёт после ответа и не теряется при откате транзакции"""
+        with self.assertRaises(ZeroDivisionError):
+            with connection.execute_wrapper(slow_queries.wrapper):
+                with transaction.atomic():
+                    list(Post.objects.filter(text='откат'))
+                    self.assertFalse(SlowQuery.objects.exists())
+                    1 / 0
+        slow_queries.flush()
+        self.assertTrue(SlowQuery.objects.filter(
+            sql__contains='FROM "posts_post"').exists())
+
+    def test_repeat_updates_last_seen(self):
+        """Повторный запрос сдвигает время последнего появления"""
+        slow_queries.record(connection, 'SELECT 1', (), 0.5)
+        old = timezone.now() - timedelta(days=1)
+        SlowQuery.objects.update(last_seen=old)
+        slow_queries.record(connection, 'SELECT 2', (), 0.5)
+        self.assertGreater(SlowQuery.objects.get().last_seen, old)
+
+    def test_admin_lists_queries(self):
+        """Админка показывает медленные запросы"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/core/slowquery/')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group
+from .. import warmup
+
+TEMP_STATS_DIR = tempfile.mkdtemp()
+
+User = get_user_model()
+
+
+@override_settings(WARMUP_STATS_DIR=TEMP_STATS_DIR,
+                   WARMUP_STATS_FLUSH_INTERVAL=0)
+class WarmupStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Group.objects.create(title='Группа', slug='group',
+                             description='Описание')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        warmup._counts.clear()
+
+    def tearDown(self):
+        for name in os.listdir(TEMP_STATS_DIR):
+            os.remove(os.path.join(TEMP_STATS_DIR, name))
+
+    def test_successful_gets_recorded(self):
+        """Учитываются успешные GET к WARMUP_VIEWS с номером страницы"""
+        group_url = reverse('posts:group_list', args=('group',))
+        self.client.get(group_url)
+        self.client.get(group_url, {'page': 2, 'utm': 'x'})
+        self.client.get(group_url, {'page': 'x'})
+        self.client.get(reverse('posts:group_list', args=('missing',)))
+        self.client.get(reverse('about:author'))
+        self.client.get(group_url, HTTP_X_WARMUP='1')
+        self.assertEqual(warmup.load(), {group_url: 2,
+                                         f'{group_url}?page=2': 1})
+
+    def write_stats(self, name, counts):
+        with open(os.path.join(TEMP_STATS_DIR, name), 'w') as file:
+            json.dump(counts, file)
+
+    def test_compact_decays_and_merges(self):
+        """Сводка объединяет файлы завершившихся процессов с затуханием"""
+        self.write_stats(warmup.SUMMARY_FILE, {'/a/': 4, '/b/': 1})
+        # Таких pid не бывает: процессы завершились.
+        self.write_stats('99999991-1.json', {'/a/': 10, '/b/': 0})
+        self.write_stats('99999992-1.json', {'/a/': 2, '/c/': 6})
+        counts = warmup.compact()
+        self.assertEqual(
+            sorted(name for name in os.listdir(TEMP_STATS_DIR)
+                   if name.endswith('.json')), [warmup.SUMMARY_FILE])
+        self.assertEqual(warmup.load(), {'/a/': 14, '/c/': 6})
+        with self.settings(WARMUP_PATHS=('/',)):
+            self.assertEqual(warmup.hottest(counts, 2), ['/', '/a/', '/c/'])
+
+    def test_repeated_compact_keeps_summary(self):
+        """Процессы одного запуска не затухают сводку повторно"""
+        self.write_stats(warmup.SUMMARY_FILE, {'/a/': 4})
+        self.write_stats('99999991-1.json', {'/a/': 2})
+        warmup.compact()
+        warmup.compact()
+        self.assertEqual(warmup.load(), {'/a/': 4})
+
+    def test_live_process_stats_kept(self):
+        """Файл работающего процесса не сводится и не удаляется"""
+        own = warmup._stats_name(os.getpid())
+        self.write_stats(own, {'/a/': 3})
+        self.assertEqual(warmup.compact(), {'/a/': 3})
+        self.assertTrue(os.path.exists(os.path.join(TEMP_STATS_DIR, own)))
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_STATS_DIR, warmup.SUMMARY_FILE)))
+
+    def test_reused_pid_stats_compacted(self):
+        """Файл процесса, чей pid занял другой процесс, сводится"""
+        self.write_stats(f'{os.getpid()}-1.json', {'/a/': 3})
+        warmup.compact()
+        self.assertEqual(
+            sorted(name for name in os.listdir(TEMP_STATS_DIR)
+                   if name.endswith('.json')), [warmup.SUMMARY_FILE])
+        self.assertEqual(warmup.load(), {'/a/': 3})
+
+
+class WarmCacheCommandTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        Group.objects.create(title='Группа', slug='group',
+                             description='Описание')
+
+    def test_pages_served_from_cache_after_warmup(self):
+        """После прогрева анонимы получают страницы из кеша"""
+        group_url = reverse('posts:group_list', args=('group',))
+        out = StringIO()
+        call_command('warm_cache', '--path', group_url, '--workers', 2,
+                     stdout=out)
+        self.assertIn('с ошибкой: 0', out.getvalue())
+        for url in ('/', group_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
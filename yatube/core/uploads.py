@@ -0,0 +1,69 @@
+"""Приём загружаемых файлов с ограничением размера.
+
+Файл читается частями и сразу пишется во временный файл на диске,
+поэтому память процесса не зависит от размера загрузки. Файл больше
+UPLOAD_MAX_BYTES дальше не записывается: вместо него в request.FILES
+попадает пустой RejectedUpload с текстом ошибки для формы.
+"""
+import io
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+from core import metrics
+
+REJECTED = metrics.Counter(
+    'upload_rejected_total',
+    'Отклонённые загрузки по причине: size, pixels, format или decode',
+    ('reason',),
+)
+
+
+class RejectedUpload(UploadedFile):
+    """Загрузка, которая не была сохранена; причина в upload_error."""
+
+    def __init__(self, name, error):
+        super().__init__(io.BytesIO(), name, size=0)
+        self.upload_error = error
+
+
+def too_large_error():
+    return f'Файл больше {filesizeformat(settings.UPLOAD_MAX_BYTES)}'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файлы на диск по частям и обрывает слишком большие."""
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type,
+                         content_length, charset, content_type_extra)
+        self.received = 0
+        self.error = None
+        # Заявленный размер части есть не у всех клиентов.
+        if (content_length is not None
+                and content_length > settings.UPLOAD_MAX_BYTES):
+            self.reject()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is not None:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            self.reject()
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.error is not None:
+            return RejectedUpload(self.file_name, self.error)
+        return super().file_complete(file_size)
+
+    def reject(self):
+        # Временный файл удаляется при закрытии, остаток тела запроса
+        # дочитывается парсером без записи.
+        self.error = too_large_error()
+        self.file.close()
+        REJECTED.inc(reason='size')
@@ -1,4 +1,12 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import REGISTRY
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
 
 
 def page_not_found(request, exception):
@@ -23,3 +31,19 @@ def permission_denied(request, exception):
     return render(request,
                   'core/403.html',
                   status=403)
+
+
+def health(request):
+    """Проверка живости для балансировщика."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def metrics(request):
+    """Метрики в формате Prometheus для staff или по METRICS_TOKEN."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_staff or token and constant_time_compare(
+            authorization, f'Bearer {token}')):
+        raise PermissionDenied
+    return HttpResponse(REGISTRY.generate_latest(),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
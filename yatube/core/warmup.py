@@ -0,0 +1,215 @@
+"""Статистика обращений к страницам и прогрев кешей по ней.
+
+Каждый процесс считает успешные GET-запросы к WARMUP_VIEWS и
+периодически пишет счётчики в WARMUP_STATS_DIR/{pid}-{start}.json,
+где start — время запуска процесса: так файл не спутать с файлом
+другого процесса, получившего тот же pid. При прогреве файлы
+завершившихся процессов сводятся в summary.json, а самые популярные
+адреса запрашиваются анонимным клиентом в несколько потоков.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = 'summary.json'
+LOCK_FILE = '.lock'
+
+_lock = threading.Lock()
+_counts = Counter()
+_flushed_at = time.monotonic()
+_handler = None
+
+
+def stats_path(request):
+    """Адрес для статистики: путь и номер страницы без прочих параметров."""
+    page = request.GET.get('page', '')
+    return f'{request.path}?page={page}' if page.isdigit() else request.path
+
+
+def record(path):
+    global _flushed_at
+    with _lock:
+        _counts[path] += 1
+        if (time.monotonic() - _flushed_at
+                < settings.WARMUP_STATS_FLUSH_INTERVAL):
+            return
+        _flushed_at = time.monotonic()
+    flush()
+
+
+def flush():
+    """Пишет счётчики процесса в его файл статистики."""
+    with _lock:
+        counts = dict(_counts)
+    if not counts or not settings.WARMUP_STATS_DIR:
+        return
+    os.makedirs(settings.WARMUP_STATS_DIR, exist_ok=True)
+    path = os.path.join(settings.WARMUP_STATS_DIR, _stats_name(os.getpid()))
+    _write(path, counts)
+
+
+atexit.register(flush)
+
+
+def _start_time(pid):
+    """Время запуска процесса в тиках от загрузки системы или None."""
+    try:
+        with open(f'/proc/{pid}/stat') as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # Имя команды в скобках может содержать пробелы; starttime — 22-е поле.
+    return stat.rsplit(')', 1)[1].split()[19]
+
+
+def _stats_name(pid):
+    return f'{pid}-{_start_time(pid) or 0}.json'
+
+
+def _write(path, data):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as stats_file:
+        json.dump(data, stats_file)
+    os.replace(temporary, path)
+
+
+def _stats_files():
+    """Файлы счётчиков процессов, без сводки."""
+    if not settings.WARMUP_STATS_DIR:
+        return []
+    paths = glob.glob(os.path.join(settings.WARMUP_STATS_DIR, '*.json'))
+    return [path for path in paths
+            if os.path.basename(path) != SUMMARY_FILE]
+
+
+def _summary_path():
+    return os.path.join(settings.WARMUP_STATS_DIR, SUMMARY_FILE)
+
+
+def _is_alive(path):
+    """Процесс, который пишет этот файл, ещё работает."""
+    try:
+        pid, start = os.path.splitext(os.path.basename(path))[0].split('-')
+        pid = int(pid)
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # Тот же pid мог достаться другому процессу.
+    current = _start_time(pid)
+    return current is None or current == start
+
+
+def load(paths=None):
+    counts = Counter()
+    if paths is None:
+        paths = _stats_files()
+        if settings.WARMUP_STATS_DIR:
+            paths.append(_summary_path())
+    for path in paths:
+        try:
+            with open(path) as stats_file:
+                counts.update(json.load(stats_file))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.warning('Не удалось прочитать статистику %s', path)
+    return counts
+
+
+def compact():
+    """Добавляет в summary.json файлы завершившихся процессов.
+
+    Прежняя сводка при этом затухает в WARMUP_STATS_DECAY раз. Процессы
+    одного запуска сводят статистику под блокировкой файла: первый
+    забирает файлы прошлого запуска, остальным сводить уже нечего, так
+    что затухание применяется один раз. Файлы работающих процессов не
+    трогаются. Возвращает счётчики сводки и работающих процессов.
+    """
+    if not settings.WARMUP_STATS_DIR:
+        return Counter()
+    os.makedirs(settings.WARMUP_STATS_DIR, exist_ok=True)
+    lock_path = os.path.join(settings.WARMUP_STATS_DIR, LOCK_FILE)
+    with open(lock_path, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        finished = [path for path in _stats_files()
+                    if not _is_alive(path)]
+        if finished:
+            summary = load([_summary_path()])
+            summary = Counter({
+                path: count * settings.WARMUP_STATS_DECAY
+                for path, count in summary.items()})
+            summary.update(load(finished))
+            _write(_summary_path(), {path: count
+                                     for path, count in summary.items()
+                                     if count >= 1})
+            for path in finished:
+                os.remove(path)
+    return load()
+
+
+def hottest(counts, top):
+    """Адреса для прогрева: обязательные и top самых популярных."""
+    paths = list(settings.WARMUP_PATHS)
+    for path, _ in counts.most_common():
+        if len(paths) >= len(settings.WARMUP_PATHS) + top:
+            break
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _fetch(path):
+    """Запрос через полный стек middleware, как от анонимного клиента."""
+    global _handler
+    if _handler is None:
+        _handler = WSGIHandler()
+    environ = RequestFactory().get(path, HTTP_HOST=settings.WARMUP_HOST,
+                                   HTTP_X_WARMUP='1').environ
+    started = time.perf_counter()
+    try:
+        response = _handler(environ, lambda status, headers, *args: None)
+        b''.join(response)
+        response.close()
+        status = response.status_code
+    except Exception:
+        logger.exception('Ошибка прогрева %s', path)
+        status = None
+    return path, status, time.perf_counter() - started
+
+
+def warm(paths, workers):
+    """Запрашивает paths в workers потоков: (адрес, статус, время)."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_fetch, paths))
+
+
+def warm_from_stats(top=None, workers=None):
+    counts = compact()
+    paths = hottest(counts, settings.WARMUP_TOP if top is None else top)
+    return warm(paths, workers or settings.WARMUP_WORKERS)
+
+
+def start_background():
+    """Прогрев при старте процесса, не задерживающий приём запросов."""
+    thread = threading.Thread(target=warm_from_stats, name='cache-warmup',
+                              daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,122 @@
+"""Async-версии view чтения для ASGI (ASYNC_VIEWS).
+
+Отдают то же, что view из views.py, но независимые запросы страницы —
+посты, число постов автора, подписку, комментарии — выполняют
+одновременно.
+"""
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import render
+
+from core.asyncviews import async_view, gather, run
+from core.object_cache import get_cached_or_404
+
+from . import images
+from .forms import CommentForm
+from .models import Comment, Follow, Group, Post, cached_users
+from .utils import author_posts_count, paginator, template_engine
+from .views import first_page_events
+
+
+async def render_async(request, template_name, context, using=None):
+    return await run(render, request, template_name, context, using=using)
+
+
+@async_view
+async def index(request):
+    post_list = Post.objects.select_related('group').cached()
+    page_obj = await run(paginator, request, post_list)
+    context = {
+        'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'index'),
+    }
+    return await render_async(request, 'posts/index.html', context,
+                              using=template_engine(request))
+
+
+def _group_or_none(slug):
+    try:
+        return Group.objects.get_cached(slug=slug)
+    except Group.DoesNotExist:
+        return None
+
+
+@async_view
+async def group_posts(request, slug):
+    # Посты выбираются по slug, не дожидаясь самой группы.
+    posts_list = Post.objects.filter(group__slug=slug).cached()
+    group, page_obj = await gather(
+        lambda: _group_or_none(slug),
+        lambda: paginator(request, posts_list),
+    )
+    if group is None:
+        raise Http404('No Group matches the given query.')
+    context = {
+        'group': group,
+        'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'group', group.slug),
+    }
+    return await render_async(request, 'posts/group_list.html', context,
+                              using=template_engine(request))
+
+
+@async_view
+async def profile(request, username):
+    author = await run(get_cached_or_404, cached_users, username=username)
+    posts_list = Post.objects.filter(
+        author=author).select_related('group').cached()
+    calls = [
+        lambda: paginator(request, posts_list),
+        lambda: author_posts_count(author),
+    ]
+    authenticated = await run(lambda: request.user.is_authenticated)
+    if authenticated:
+        calls.append(lambda: bool(Follow.objects.filter(
+            user=request.user, author=author).cached()))
+    page_obj, posts_count, *following = await gather(*calls)
+    context = {
+        'page_obj': page_obj,
+        'author': author,
+        'posts_count': posts_count,
+    }
+    if authenticated:
+        context['following'] = following[0]
+    return await render_async(request, 'posts/profile.html', context,
+                              using=template_engine(request))
+
+
+@async_view
+async def post_detail(request, post_id):
+    user = request.user
+    post = await run(get_cached_or_404, Post.objects, pk=post_id)
+    author = await run(lambda: post.author)
+    posts_count, comments, image = await gather(
+        lambda: author_posts_count(author),
+        lambda: list(Comment.objects.filter(post_id=post_id)),
+        lambda: images.responsive([post]).get(post.pk),
+    )
+    context = {
+        'posts_count': posts_count,
+        'post': post,
+        'image': image,
+        'user': user,
+        'form': CommentForm(request.POST or None),
+        'comments': comments
+    }
+    return await render_async(request, 'posts/post_detail.html', context)
+
+
+@login_required
+@async_view
+async def follow_index(request):
+    user_following_authors = Follow.objects.filter(
+        user=request.user).values('author')
+    posts = Post.objects.filter(
+        author__in=user_following_authors).cached()
+    page_obj = await run(paginator, request, posts)
+    context = {
+        'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'follow'),
+    }
+    return await render_async(request, 'posts/follow.html', context,
+                              using=template_engine(request))
@@ -0,0 +1,42 @@
+"""Кеширование отрендеренных карточек постов.
+
+Ключ карточки содержит Post.version, которая растёт при изменении
+поста, имени автора или группы, поэтому устаревшие карточки
+не сбрасываются, а просто перестают запрашиваться.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+
+from . import images
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post, engine, show_author, show_group):
+    return (f'post-card:{engine}:{int(show_author)}{int(show_group)}:'
+            f'{post.pk}:{post.version}')
+
+
+def render_cards(posts, engine, show_author=True, show_group=True):
+    """HTML карточек: кеш читается одним get_many, рендерятся промахи"""
+    keys = {card_key(post, engine, show_author, show_group): post
+            for post in posts}
+    cached = cache.get_many(keys)
+    missing = {key: post for key, post in keys.items() if key not in cached}
+    rendered = {}
+    if missing:
+        template = get_template(CARD_TEMPLATE, using=engine)
+        # Картинки всех рендерящихся карточек ищутся одним пакетом.
+        card_images = images.responsive(missing.values())
+    for key, post in missing.items():
+        rendered[key] = template.render({
+            'post': post,
+            'image': card_images.get(post.pk),
+            'show_author': show_author,
+            'show_group': show_group,
+        })
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    cached.update(rendered)
+    return [cached[key] for key in keys]
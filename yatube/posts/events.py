@@ -0,0 +1,117 @@
+"""События о новых постах для открытых лент.
+
+Новый пост публикуется в каналы всей ленты, своей группы и автора.
+ASGI-приложение отдаёт их по SSE_URL: index/, group/<slug>/ и follow/
+(посты авторов, на которых подписан пользователь из сессии). Клиент
+получает только номер поста и загружает его карточку из posts:new_cards.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+from django.utils.module_loading import import_string
+
+from core import pubsub, sse
+
+from .models import Follow, Group, Post
+
+ALL_CHANNEL = 'posts'
+
+
+def group_channel(group_id):
+    return f'posts:group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'posts:author:{author_id}'
+
+
+def message(post):
+    return {'id': post.pk, 'author': post.author_id, 'group': post.group_id}
+
+
+def publish_post(post):
+    data = message(post)
+    pubsub.publish(ALL_CHANNEL, data)
+    pubsub.publish(author_channel(post.author_id), data)
+    if post.group_id is not None:
+        pubsub.publish(group_channel(post.group_id), data)
+
+
+def feed_url(feed, *args):
+    """Адрес потока событий ленты: index, group или follow."""
+    path = '/'.join((feed,) + tuple(str(arg) for arg in args))
+    return f'{settings.SSE_URL}{path}/'
+
+
+def to_event(channel, data):
+    return sse.event(data, name='post', event_id=data['id'])
+
+
+def _user(scope):
+    """Пользователь из cookie сессии, как у AuthenticationMiddleware."""
+    headers = dict(scope.get('headers', ()))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    engine = import_string(settings.SESSION_ENGINE + '.SessionStore')
+    request = HttpRequest()
+    request.session = engine(cookies.get(settings.SESSION_COOKIE_NAME))
+    return get_user(request)
+
+
+def resolve_feed(scope, path):
+    """(каналы, посты ленты) для пути потока или код ошибки."""
+    parts = [part for part in path.split('/') if part]
+    if parts == ['index']:
+        return [ALL_CHANNEL], Post.objects.all()
+    if len(parts) == 2 and parts[0] == 'group':
+        try:
+            group = Group.objects.get_cached(slug=parts[1])
+        except Group.DoesNotExist:
+            return 404
+        return [group_channel(group.pk)], group.posts.all()
+    if parts == ['follow']:
+        user = _user(scope)
+        if not user.is_authenticated:
+            return 403
+        authors = list(Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True))
+        return ([author_channel(author) for author in authors],
+                Post.objects.filter(author_id__in=authors))
+    return 404
+
+
+def missed_events(posts, last_id):
+    """События постов ленты после last_id, пропущенные клиентом."""
+    if not last_id.isdigit():
+        return []
+    missed = posts.filter(pk__gt=int(last_id)).order_by('pk')[
+        :settings.SSE_REPLAY_LIMIT]
+    return [to_event(None, message(post))
+            for post in missed.only('pk', 'author_id', 'group_id')]
+
+
+async def application(scope, receive, send):
+    """ASGI-приложение потоков событий лент."""
+    path = scope['path'][len(settings.SSE_URL):]
+    headers = dict(scope.get('headers', ()))
+    last_id = headers.get(b'last-event-id', b'').decode('latin-1')
+    feed = await sync_to_async(resolve_feed)(scope, path)
+    if feed == 404:
+        await sse.respond(send, 404, 'Лента не найдена')
+        return
+    if feed == 403:
+        await sse.respond(send, 403, 'Нужен вход')
+        return
+    channels, posts = feed
+    # Подписка оформляется до поиска пропущенных постов, чтобы
+    # не потерять созданные между ними; повтор события клиенту не мешает.
+    subscription = pubsub.subscribe(channels)
+    try:
+        initial = await sync_to_async(missed_events)(posts, last_id)
+    except Exception:
+        subscription.close()
+        raise
+    await sse.stream(receive, send, subscription, initial,
+                     retry=settings.SSE_RETRY,
+                     heartbeat=settings.SSE_HEARTBEAT, to_event=to_event)
@@ -1,16 +1,43 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
+from . import images
 from .models import Post, Comment
 
 
+class UploadedImageField(forms.ImageField):
+    """ImageField, проверяющий картинку по заголовку без декодирования."""
+
+    def to_python(self, data):
+        error = getattr(data, 'upload_error', None)
+        if error is not None:
+            raise ValidationError(error, code='too_large')
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        image = images.check_image(upload)
+        upload.image = image
+        upload.content_type = Image.MIME.get(image.format)
+        return upload
+
+
 class PostForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['group'].empty_label = 'Группа не выбрана'
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': UploadedImageField}
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,272 @@
+"""Обработка картинок постов при загрузке.
+
+Оригинал поворачивается по EXIF, уменьшается до POST_IMAGE_MAX_SIZE
+и пересохраняется без метаданных. Для каждого варианта из
+POST_IMAGE_VARIANTS рядом сохраняются JPEG и WebP всех ширин srcset,
+поэтому шаблонам не нужно открывать файл ради размеров или миниатюр.
+Крошечное превью и преобладающий цвет хранятся в самом посте и
+выводятся в ленте вместо картинки, пока та не загрузилась.
+"""
+import base64
+import io
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core.thumbnail import get_thumbnails
+from core.uploads import REJECTED
+
+# Форматы, в которых оригинал остаётся; остальные сохраняются в JPEG.
+KEPT_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif',
+                'WEBP': '.webp'}
+
+VARIANTS_DIR = 'posts/variants'
+
+ResponsiveImage = namedtuple(
+    'ResponsiveImage',
+    'src srcset webp_srcset sizes width height placeholder color')
+
+
+class NormalizedImage(ContentFile):
+    """Обработанный оригинал с размерами и превью, ещё не сохранённый
+    в storage."""
+
+    def __init__(self, content, name, size, preview):
+        super().__init__(content, name)
+        self.width, self.height = size
+        self.placeholder, self.color = preview
+
+
+def save_options(image_format):
+    if image_format == 'JPEG':
+        return {'quality': settings.POST_IMAGE_QUALITY, 'optimize': True,
+                'progressive': True}
+    if image_format == 'WEBP':
+        return {'quality': settings.POST_IMAGE_WEBP_QUALITY, 'method': 6}
+    if image_format == 'PNG':
+        return {'optimize': True}
+    return {}
+
+
+def placeholder(image):
+    """Превью картинки PIL как data: URI WebP и её преобладающий цвет.
+
+    Превью в POST_IMAGE_PLACEHOLDER_SIZE пикселей по большей стороне
+    занимает пару сотен байт, браузер растягивает его на место картинки.
+    """
+    image = image.convert('RGB')
+    preview = image.copy()
+    size = settings.POST_IMAGE_PLACEHOLDER_SIZE
+    preview.thumbnail((size, size), Image.LANCZOS)
+    output = io.BytesIO()
+    preview.save(output, 'WEBP', quality=50)
+    data = base64.b64encode(output.getvalue()).decode()
+    colors = image.resize((64, 64), Image.BILINEAR).quantize(colors=5)
+    _, index = max(colors.getcolors())
+    red, green, blue = colors.getpalette()[index * 3:index * 3 + 3]
+    return (f'data:image/webp;base64,{data}',
+            f'#{red:02x}{green:02x}{blue:02x}')
+
+
+def placeholder_from_file(image_file):
+    """placeholder() для сохранённого файла с учётом EXIF."""
+    image = Image.open(image_file)
+    image.load()
+    return placeholder(ImageOps.exif_transpose(image))
+
+
+def check_image(upload):
+    """Открытая картинка PIL из загрузки, проверенная по заголовку.
+
+    Пиксели не декодируются: формат и размер читаются из заголовка, а
+    картинки больше POST_IMAGE_MAX_PIXELS отклоняются до декодирования.
+    """
+    error = getattr(upload, 'upload_error', None)
+    if error is not None:
+        raise ValidationError(error, code='too_large')
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        REJECTED.inc(reason='format')
+        raise ValidationError('Загрузите правильное изображение',
+                              code='invalid_image')
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        REJECTED.inc(reason='pixels')
+        raise ValidationError(
+            f'Картинка больше {settings.POST_IMAGE_MAX_PIXELS} пикселей',
+            code='too_many_pixels')
+    upload.seek(0)
+    return image
+
+
+def normalize(upload):
+    """NormalizedImage из загруженного файла.
+
+    Анимированные картинки сохраняются как есть: пересохранение кадров
+    не стоит потери анимации. check_image проверяет только заголовок,
+    поэтому битые данные обнаруживаются здесь, при декодировании.
+    """
+    try:
+        return _normalize(upload)
+    except (OSError, Image.DecompressionBombError):
+        REJECTED.inc(reason='decode')
+        raise ValidationError('Загрузите правильное изображение',
+                              code='invalid_image')
+
+
+def _normalize(upload):
+    upload.seek(0)
+    image = Image.open(upload)
+    image_format = image.format
+    if getattr(image, 'n_frames', 1) > 1:
+        preview = placeholder(image)
+        upload.seek(0)
+        return NormalizedImage(upload.read(), upload.name, image.size,
+                               preview)
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    # JPEG сразу декодируется в уменьшенном в 2–8 раз масштабе.
+    image.draft(image.mode, (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    stem, extension = os.path.splitext(os.path.basename(upload.name))
+    if image_format not in KEPT_FORMATS:
+        image_format = 'PNG' if image.mode in ('RGBA', 'LA', 'P') else 'JPEG'
+        extension = KEPT_FORMATS[image_format]
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    # Без exif и icc_profile метаданные не попадают в файл.
+    image.save(output, image_format, **save_options(image_format))
+    return NormalizedImage(output.getvalue(), stem + extension, image.size,
+                           placeholder(image))
+
+
+def scaled(size, width):
+    """Размер варианта size при ширине width с теми же пропорциями."""
+    return width, round(size[1] * width / size[0])
+
+
+def variant_name(image_name, size, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{size[0]}x{size[1]}{extension}'
+
+
+def _variant_names(image_name):
+    for options in settings.POST_IMAGE_VARIANTS.values():
+        for width in options['widths']:
+            size = scaled(options['size'], width)
+            for extension in ('.jpg', '.webp'):
+                yield size, extension, variant_name(image_name, size,
+                                                    extension)
+
+
+def make_variants(image):
+    """Сохраняет JPEG и WebP всех ширин для POST_IMAGE_VARIANTS.
+
+    Имена картинок зависят от содержимого, поэтому уже сохранённые
+    варианты той же картинки не пересоздаются.
+    """
+    missing = [(size, extension, name) for size, extension, name
+               in _variant_names(image.name)
+               if not default_storage.exists(name)]
+    if not missing:
+        return
+    with image.open() as image_file:
+        source = Image.open(image_file)
+        source.load()
+    if source.mode not in ('RGB', 'L'):
+        source = source.convert('RGB')
+    formats = {'.jpg': 'JPEG', '.webp': 'WEBP'}
+    for size, extension, name in missing:
+        variant = ImageOps.fit(source, size, Image.LANCZOS)
+        output = io.BytesIO()
+        variant.save(output, formats[extension],
+                     **save_options(formats[extension]))
+        default_storage.save(name, ContentFile(output.getvalue()))
+
+
+def delete_variants(image_name):
+    for _, _, name in _variant_names(image_name):
+        default_storage.delete(name)
+
+
+def _srcset(urls, widths):
+    return ', '.join(f'{url} {width}w' for url, width in zip(urls, widths))
+
+
+def _from_variants(post, options):
+    image_name = post.image.name
+    sizes = [scaled(options['size'], width) for width in options['widths']]
+    urls = {
+        extension: [default_storage.url(
+            variant_name(image_name, size, extension)) for size in sizes]
+        for extension in ('.jpg', '.webp')
+    }
+    return ResponsiveImage(
+        default_storage.url(
+            variant_name(image_name, options['size'], '.jpg')),
+        _srcset(urls['.jpg'], options['widths']),
+        _srcset(urls['.webp'], options['widths']),
+        options['sizes'],
+        *options['size'],
+        post.image_placeholder,
+        post.image_color,
+    )
+
+
+def _from_thumbnails(post, thumbnails, options):
+    pairs = [(thumbnail.url, width)
+             for thumbnail, width in zip(thumbnails, options['widths'])
+             if thumbnail is not None]
+    if not pairs:
+        return None
+    urls, widths = zip(*pairs)
+    by_width = dict(zip(widths, urls))
+    return ResponsiveImage(
+        by_width.get(options['size'][0], urls[-1]),
+        _srcset(urls, widths),
+        None,
+        options['sizes'],
+        *options['size'],
+        post.image_placeholder,
+        post.image_color,
+    )
+
+
+def responsive(posts, name='card'):
+    """ResponsiveImage варианта name для постов с картинками по pk.
+
+    Для загрузок с готовыми вариантами адреса строятся без обращений
+    к хранилищу, для старых загрузок миниатюры sorl всех постов и ширин
+    ищутся одним пакетом.
+    """
+    options = settings.POST_IMAGE_VARIANTS[name]
+    widths = options['widths']
+    result = {}
+    legacy = []
+    for post in posts:
+        if not post.image:
+            continue
+        if post.image_width is None:
+            legacy.append(post)
+        else:
+            result[post.pk] = _from_variants(post, options)
+    thumbnails = get_thumbnails([
+        (post.image, '{}x{}'.format(*scaled(options['size'], width)),
+         {'crop': 'center', 'upscale': True})
+        for post in legacy for width in widths
+    ])
+    for index, post in enumerate(legacy):
+        image = _from_thumbnails(
+            post, thumbnails[index * len(widths):(index + 1) * len(widths)],
+            options)
+        if image is not None:
+            result[post.pk] = image
+    return result
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core import page_cache
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Считает превью и преобладающий цвет картинок постов, '
+            'загруженных до их появления')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Сколько постов читать из БД за раз')
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать и уже заполненные посты')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        if not options['all']:
+            posts = posts.filter(image_placeholder='')
+        done = failed = 0
+        updated = []
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            try:
+                with post.image.open() as image_file:
+                    placeholder, color = images.placeholder_from_file(
+                        image_file)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'{post.image.name}: {error}')
+                continue
+            # update() без save(): картинка и её варианты не меняются,
+            # а версия растёт, чтобы карточки отрендерились заново.
+            Post.objects.filter(pk=post.pk).update(
+                image_placeholder=placeholder, image_color=color,
+                version=F('version') + 1)
+            updated.append(post.pk)
+            done += 1
+            if len(updated) >= options['batch_size']:
+                Post.objects.invalidate(updated)
+                updated = []
+        Post.objects.invalidate(updated)
+        if done:
+            # Закешированные страницы отдают карточки без превью.
+            page_cache.invalidate()
+        self.stdout.write(f'Заполнено: {done}, ошибок: {failed}')
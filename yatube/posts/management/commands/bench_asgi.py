@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+
+User = get_user_model()
+
+SERVERS = ('wsgi', 'asgi')
+# Адрес клиента не из INTERNAL_IPS, чтобы не включалась debug toolbar.
+CLIENT_ADDR = '192.0.2.1'
+
+
+def delay_queries(latency):
+    """Добавляет к каждому запросу в БД задержку сети, с."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность view чтения под WSGI и '
+            'под ASGI с async view при одновременных запросах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[1, 10, 50],
+                            help='Число одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Число запросов на замер')
+        parser.add_argument('--db-latency', type=float, default=2,
+                            help='Задержка каждого запроса в БД, мс')
+        parser.add_argument('--user', help='Пользователь, от имени '
+                            'которого идут запросы (мимо кеша страниц)')
+        parser.add_argument('--server', choices=SERVERS,
+                            help='Замерить только этот сервер в текущем '
+                                 'процессе и вывести JSON')
+
+    def make_paths(self):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        if post is None:
+            raise CommandError('Для замера нужен хотя бы один пост в группе')
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(post.group.slug,)),
+            reverse('posts:profile', args=(post.author.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+            reverse('posts:follow_index'),
+        ], post.author
+
+    def make_cookie(self, user):
+        """Cookie сессии пользователя, как после входа."""
+        engine = import_string(settings.SESSION_ENGINE + '.SessionStore')
+        session = engine()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def handle(self, *args, **options):
+        if options['server']:
+            return self.measure_server(options)
+        rows = {}
+        for server in SERVERS:
+            env = dict(os.environ,
+                       ASYNC_VIEWS='1' if server == 'asgi' else '0')
+            command = [sys.executable, sys.argv[0], 'bench_asgi',
+                       '--server', server,
+                       '--requests', str(options['requests']),
+                       '--db-latency', str(options['db_latency']),
+                       '--concurrency',
+                       *(str(value) for value in options['concurrency'])]
+            if options['user']:
+                command += ['--user', options['user']]
+            output = subprocess.run(command, env=env, check=True,
+                                    stdout=subprocess.PIPE).stdout
+            for line in output.decode().splitlines():
+                result = json.loads(line)
+                rows[(server, result['concurrency'])] = result
+        self.stdout.write(f'{"сервер":<8}{"клиентов":>10}{"запр/с":>10}'
+                          f'{"p50, мс":>10}{"p95, мс":>10}{"ошибок":>8}')
+        for concurrency in options['concurrency']:
+            for server in SERVERS:
+                result = rows[(server, concurrency)]
+                self.stdout.write(
+                    f'{server:<8}{concurrency:>10}'
+                    f'{result["throughput"]:>10.1f}'
+                    f'{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+                    f'{result["errors"]:>8}')
+
+    def measure_server(self, options):
+        if options['db_latency']:
+            delay_queries(options['db_latency'] / 1000)
+        paths, author = self.make_paths()
+        user = (User.objects.get(username=options['user'])
+                if options['user'] else author)
+        cookie = self.make_cookie(user)
+        if options['server'] == 'asgi':
+            from yatube.asgi import application
+            load = self.asgi_load(application)
+        else:
+            from django.core.wsgi import get_wsgi_application
+            load = self.wsgi_load(get_wsgi_application())
+        for concurrency in options['concurrency']:
+            # Первый проход прогревает кеши и соединения.
+            load(paths, cookie, concurrency, len(paths))
+            started = time.perf_counter()
+            timings, errors = load(paths, cookie, concurrency,
+                                   options['requests'])
+            elapsed = time.perf_counter() - started
+            timings.sort()
+            self.stdout.write(json.dumps({
+                'concurrency': concurrency,
+                'throughput': len(timings) / elapsed,
+                'p50': statistics.median(timings) * 1000,
+                'p95': timings[int(len(timings) * 0.95) - 1] * 1000,
+                'errors': errors,
+            }))
+
+    def wsgi_load(self, application):
+        def request(path, cookie):
+            environ = {'PATH_INFO': path, 'HTTP_COOKIE': cookie,
+                       'REMOTE_ADDR': CLIENT_ADDR}
+            setup_testing_defaults(environ)
+            status = []
+            started = time.perf_counter()
+            body = application(
+                environ, lambda code, headers: status.append(code))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            return time.perf_counter() - started, status[0]
+
+        def load(paths, cookie, concurrency, count):
+            with ThreadPoolExecutor(concurrency) as executor:
+                results = list(executor.map(
+                    request, (paths[i % len(paths)] for i in range(count)),
+                    [cookie] * count))
+            return self.collect(results)
+        return load
+
+    async def asgi_request(self, application, path, cookie):
+        scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': path, 'root_path': '',
+                 'query_string': b'',
+                 'headers': [(b'host', b'127.0.0.1'),
+                             (b'cookie', cookie.encode())],
+                 'server': ('127.0.0.1', 80),
+                 'client': (CLIENT_ADDR, 12345)}
+        messages = [{'type': 'http.request', 'body': b''}]
+        done = asyncio.Event()
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                done.set()
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        return time.perf_counter() - started, status[0]
+
+    def asgi_load(self, application):
+        async def clients(paths, cookie, concurrency, count):
+            numbers = iter(range(count))
+            results = []
+
+            async def client():
+                for i in numbers:
+                    results.append(await self.asgi_request(
+                        application, paths[i % len(paths)], cookie))
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return results
+
+        def load(paths, cookie, concurrency, count):
+            return self.collect(asyncio.run(
+                clients(paths, cookie, concurrency, count)))
+        return load
+
+    def collect(self, results):
+        timings = [duration for duration, _ in results]
+        errors = sum(1 for _, status in results
+                     if int(str(status).split()[0]) != 200)
+        return timings, errors
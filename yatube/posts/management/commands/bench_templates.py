@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+TEMPLATES = {
+    'posts/index.html': 'posts:index',
+    'posts/group_list.html': 'posts:group_list',
+    'posts/profile.html': 'posts:profile',
+    'posts/follow.html': 'posts:follow_index',
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга страниц ленты шаблонизаторами '
+            'Django и Jinja2 без обращений к БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, nargs='+',
+                            default=[10, 50, 100],
+                            help='Количество постов на странице')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Число рендерингов на замер')
+
+    def make_context(self, posts_per_page):
+        author = User(id=1, username='author', first_name='Лев',
+                      last_name='Толстой')
+        group = Group(id=1, title='Группа', slug='group',
+                      description='Описание группы')
+        now = timezone.now()
+        posts = [
+            Post(id=i, text=f'Текст поста номер {i} ' * 10,
+                 author=author, group=group, pub_date=now)
+            for i in range(1, posts_per_page + 1)
+        ]
+        page_obj = Paginator(posts, posts_per_page).page(1)
+        return {'page_obj': page_obj, 'group': group, 'author': author,
+                'posts_count': posts_per_page}
+
+    def make_request(self, view_name):
+        args = {
+            'posts:group_list': ('group',),
+            'posts:profile': ('author',),
+        }.get(view_name, ())
+        path = reverse(view_name, args=args)
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(path)
+        return request
+
+    def measure(self, template, context, request, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            # Иначе фрагментный кеш главной отдаст готовый HTML.
+            cache.clear()
+            template.render(dict(context), request)
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"шаблон":<24}{"постов":>8}'
+                          f'{"django, мс":>14}{"jinja2, мс":>14}'
+                          f'{"ускорение":>12}')
+        for posts_per_page in options['posts']:
+            context = self.make_context(posts_per_page)
+            for name, view_name in TEMPLATES.items():
+                request = self.make_request(view_name)
+                timings = [
+                    self.measure(get_template(name, using=engine), context,
+                                 request, options['repeat'])
+                    for engine in ('django', 'jinja2')
+                ]
+                self.stdout.write(
+                    f'{name:<24}{posts_per_page:>8}'
+                    f'{timings[0]:>14.2f}{timings[1]:>14.2f}'
+                    f'{timings[0] / timings[1]:>11.1f}x'
+                )
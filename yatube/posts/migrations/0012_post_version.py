@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20220125_0708'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Меняется при каждом изменении карточки поста', verbose_name='Версия'),
+        ),
+    ]
@@ -1,7 +1,20 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.object_cache import ObjectCache, ObjectCacheManager
+from core.query_cache import CachedQuerySet
+from core.storage import ContentAddressedStorage
+from . import images
+
 User = get_user_model()
+# Пользователи из кеша для поиска авторов по username. Кешируется только
+# имя: пароль, почта и права страницам не нужны.
+cached_users = ObjectCache(User, keys=('username',), fields=(
+    'username', 'first_name', 'last_name'))
 
 
 class Group(models.Model):
@@ -15,6 +28,9 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание группы')
 
+    objects = ObjectCacheManager.from_queryset(CachedQuerySet)(
+        keys=('slug',))
+
     def __str__(self):
         return self.title
 
@@ -45,8 +61,39 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        verbose_name='Превью картинки',
+        blank=True,
+        editable=False,
+        help_text='Крошечное превью картинки в виде data: URI'
+    )
+    image_color = models.CharField(
+        verbose_name='Цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=1,
+        editable=False,
+        help_text='Меняется при каждом изменении карточки поста'
+    )
+
+    objects = ObjectCacheManager.from_queryset(CachedQuerySet)()
 
     class Meta:
         ordering = ['-pub_date']
@@ -54,6 +101,27 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.pk is not None and (update_fields is None
+                                    or 'version' in update_fields):
+            self.version += 1
+        upload = getattr(self.image, '_file', None)
+        new_image = (isinstance(upload, images.NormalizedImage)
+                     and not self.image._committed)
+        # Ссылку на новый файл берёт storage.save().
+        self._image_acquired = bool(self.image) and not self.image._committed
+        if new_image:
+            self.image_width, self.image_height = upload.width, upload.height
+            self.image_placeholder = upload.placeholder
+            self.image_color = upload.color
+        elif not self.image:
+            self.image_width = self.image_height = None
+            self.image_placeholder = self.image_color = ''
+        super().save(*args, **kwargs)
+        if new_image:
+            images.make_variants(self.image)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -76,6 +144,8 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = CachedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
 
@@ -94,6 +164,8 @@ class Follow(models.Model):
         related_name='following'
     )
 
+    objects = CachedQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -101,3 +173,67 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+
+
+class ImageUpload(models.Model):
+    """Картинка поста, загружаемая частями.
+
+    Части дописываются в файл CHUNKED_UPLOAD_DIR/{id}.part, offset —
+    сколько байт уже принято.
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='image_uploads'
+    )
+    filename = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255
+    )
+    size = models.PositiveIntegerField(
+        verbose_name='Размер, байт'
+    )
+    offset = models.PositiveIntegerField(
+        verbose_name='Принято, байт',
+        default=0
+    )
+    created = models.DateTimeField(
+        verbose_name='Начало загрузки',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    @property
+    def path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+    def append(self, stream, length):
+        """Дописывает length байт из stream, читая его частями."""
+        os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+        with open(self.path, 'ab') as part:
+            part.truncate(self.offset)
+            remaining = length
+            while remaining:
+                chunk = stream.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                part.write(chunk)
+                remaining -= len(chunk)
+        return length - remaining
+
+    def delete(self, *args, **kwargs):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        return super().delete(*args, **kwargs)
@@ -0,0 +1,242 @@
+"""Картинки постов нужного размера по подписанному адресу.
+
+Адрес содержит имя оригинала и параметры (ширина, высота, обрезка,
+формат), подписанные SECRET_KEY, поэтому размеры выбирает тот, кто
+строит адрес, а не произвольный клиент. Готовые картинки хранятся в
+IMAGE_RESIZE_CACHE_DIR; при превышении IMAGE_RESIZE_CACHE_MAX_BYTES
+удаляются давно не запрошенные. Новые картинки создаются в пуле из
+IMAGE_RESIZE_WORKERS потоков, одинаковые запросы ждут одну генерацию.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from PIL import Image, ImageOps
+
+from core import metrics
+
+from .images import save_options
+
+FORMATS = {'jpeg': ('JPEG', 'image/jpeg'),
+           'webp': ('WEBP', 'image/webp'),
+           'png': ('PNG', 'image/png')}
+
+# После очистки кеш занимает не больше этой доли предела.
+EVICT_TO = 0.9
+
+REQUESTS = metrics.Counter(
+    'image_resize_requests_total',
+    'Запросы картинок по размеру: hit, miss или waited',
+    ('result',),
+)
+RENDER_TIME = metrics.Histogram(
+    'image_resize_render_seconds',
+    'Время создания картинки нужного размера',
+)
+
+Params = namedtuple('Params', 'name width height crop format')
+
+_signer = signing.Signer(salt='posts.resize')
+_lock = threading.Lock()
+_pending = {}
+_executor = None
+# Оценка размера кеша, байт; None — ещё не считался в этом процессе.
+_cache_bytes = None
+
+
+def _value(params):
+    return '|'.join((params.name, str(params.width), str(params.height),
+                     str(int(params.crop)), params.format))
+
+
+def url(image, width, height=0, crop=False, format='jpeg'):
+    """Подписанный адрес картинки image (файл или имя) нужного размера."""
+    params = Params(getattr(image, 'name', image), int(width),
+                    int(height or 0), bool(crop), format)
+    _validate(params)
+    query = {'w': params.width, 'h': params.height,
+             'crop': int(params.crop), 'fm': params.format,
+             's': _signer.signature(_value(params))}
+    path = reverse('posts:resized_image', args=[params.name])
+    return f'{path}?{urlencode(query)}'
+
+
+def _validate(params):
+    max_size = settings.IMAGE_RESIZE_MAX_SIZE
+    if not 0 < params.width <= max_size or not 0 <= params.height <= max_size:
+        raise ValueError('Недопустимый размер картинки')
+    if params.crop and not params.height:
+        raise ValueError('Для обрезки нужна высота')
+    if params.format not in FORMATS:
+        raise ValueError('Недопустимый формат картинки')
+
+
+def from_query(name, query):
+    """Params из параметров адреса.
+
+    ValueError — параметры некорректны, BadSignature — подпись не совпала.
+    """
+    params = Params(name, int(query.get('w', '')),
+                    int(query.get('h') or 0), query.get('crop') == '1',
+                    query.get('fm', 'jpeg'))
+    _validate(params)
+    signature = _signer.signature(_value(params))
+    if not constant_time_compare(signature, query.get('s', '')):
+        raise signing.BadSignature('Подпись картинки не совпала')
+    return params
+
+
+def cache_key(params):
+    return hashlib.sha1(_value(params).encode()).hexdigest()
+
+
+def cache_path(params):
+    key = cache_key(params)
+    extension = FORMATS[params.format][0].lower()
+    return os.path.join(settings.IMAGE_RESIZE_CACHE_DIR, key[:2],
+                        f'{key}.{extension}')
+
+
+def content_type(params):
+    return FORMATS[params.format][1]
+
+
+def render(params):
+    """Байты картинки по параметрам из оригинала в хранилище постов."""
+    from .models import Post
+
+    storage = Post._meta.get_field('image').storage
+    with storage.open(params.name) as image_file:
+        image = Image.open(image_file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if params.crop:
+        image = ImageOps.fit(image, (params.width, params.height),
+                             Image.LANCZOS)
+    else:
+        # Без обрезки размер только уменьшается, пропорции сохраняются.
+        image.thumbnail((params.width, params.height or image.height),
+                        Image.LANCZOS)
+    image_format = FORMATS[params.format][0]
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, image_format, **save_options(image_format))
+    return output.getvalue()
+
+
+def _generate(params, path):
+    started = time.perf_counter()
+    data = render(params)
+    RENDER_TIME.observe(time.perf_counter() - started)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as cached_file:
+        cached_file.write(data)
+    os.replace(temporary, path)
+    _account(len(data))
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_RESIZE_WORKERS,
+                thread_name_prefix='image-resize')
+        return _executor
+
+
+def _wait_generated(params, path):
+    """Создаёт картинку в пуле; параллельные запросы ждут ту же задачу."""
+    executor = _get_executor()
+    with _lock:
+        future = _pending.get(path)
+        waited = future is not None
+        if future is None:
+            future = executor.submit(_generate, params, path)
+            _pending[path] = future
+            future.add_done_callback(lambda _: _forget(path))
+    REQUESTS.inc(result='waited' if waited else 'miss')
+    future.result(timeout=settings.IMAGE_RESIZE_TIMEOUT)
+
+
+def _forget(path):
+    with _lock:
+        _pending.pop(path, None)
+
+
+def open_resized(params):
+    """Открытый файл готовой картинки; при промахе она создаётся.
+
+    Время изменения файла обновляется при каждом обращении и служит
+    временем последнего использования для вытеснения.
+    """
+    path = cache_path(params)
+    try:
+        cached_file = open(path, 'rb')
+    except FileNotFoundError:
+        _wait_generated(params, path)
+        cached_file = open(path, 'rb')
+    else:
+        REQUESTS.inc(result='hit')
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        # Файл уже вытеснен, но открытый дескриптор остаётся читаемым.
+        pass
+    return cached_file
+
+
+def _entries():
+    for root, _, names in os.walk(settings.IMAGE_RESIZE_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def _account(size):
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is not None:
+            _cache_bytes += size
+            if _cache_bytes <= settings.IMAGE_RESIZE_CACHE_MAX_BYTES:
+                return
+    evict()
+
+
+def evict(max_bytes=None):
+    """Удаляет давно не запрошенные картинки, пока кеш больше предела.
+
+    Возвращает размер кеша после очистки, байт.
+    """
+    global _cache_bytes
+    if max_bytes is None:
+        max_bytes = settings.IMAGE_RESIZE_CACHE_MAX_BYTES
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    if total > max_bytes:
+        for _, size, path in entries:
+            if total <= max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    with _lock:
+        _cache_bytes = total
+    return total
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from sorl import thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core import page_cache
+from . import events, images
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся в карточке поста
+AUTHOR_CARD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def bump_versions(posts):
+    pks = list(posts.values_list('pk', flat=True))
+    posts.update(version=F('version') + 1)
+    Post.objects.invalidate(pks)
+    page_cache.invalidate()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def content_changed(sender, **kwargs):
+    page_cache.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: events.publish_post(instance))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_CARD_FIELDS & set(
+            update_fields):
+        return
+    bump_versions(Post.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_versions(Post.objects.filter(group=instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump_versions(Post.objects.filter(group=instance))
+
+
+def release_image(name):
+    """Убирает ссылку на картинку после коммита.
+
+    Если картинка больше нигде не используется, удаляются и её варианты
+    с миниатюрами.
+    """
+    storage = Post._meta.get_field('image').storage
+
+    def release():
+        if storage.release(name):
+            images.delete_variants(name)
+            # Ключи миниатюр sorl зависят от хранилища исходника.
+            thumbnail.delete(ImageFile(name, storage), delete_file=False)
+
+    transaction.on_commit(release)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Не обращаемся к отложенному полю, чтобы не делать запрос.
+    image = instance.__dict__.get('image')
+    instance._stored_image = getattr(image, 'name', image) or ''
+
+
+@receiver(post_save, sender=Post)
+def image_saved(sender, instance, **kwargs):
+    if 'image' not in instance.__dict__:
+        return
+    name = instance.image.name or ''
+    stored = getattr(instance, '_stored_image', '')
+    if name == stored:
+        return
+    if name and not getattr(instance, '_image_acquired', False):
+        instance.image.storage.acquire(name)
+    if stored:
+        release_image(stored)
+    instance._stored_image = name
+
+
+@receiver(post_delete, sender=Post)
+def image_deleted(sender, instance, **kwargs):
+    name = getattr(instance, '_stored_image', '')
+    if name:
+        release_image(name)
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, show_author=True, show_group=True):
+    cards = render_cards(posts, 'django', show_author, show_group)
+    return mark_safe('\n<hr>\n'.join(cards))
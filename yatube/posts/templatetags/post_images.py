@@ -0,0 +1,11 @@
+from django import template
+
+from .. import resize
+
+register = template.Library()
+
+
+@register.simple_tag
+def resized_url(image, width, height=0, crop=False, format='jpeg'):
+    """{% resized_url post.image 480 170 crop=True format='webp' %}"""
+    return resize.url(image, width, height, crop, format)
@@ -0,0 +1,146 @@
+import importlib
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.http import Http404
+from django.urls import clear_url_caches, resolve
+
+from core import asyncviews, instrumentation
+from core.models import SlowQuery
+from yatube import urls as root_urls
+from .. import async_views, urls
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Текст', author=cls.author,
+                                       group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def get(self, path, view):
+        """Ответы async и обычной view на один запрос."""
+        sync_response = self.client.get(path)
+        cache.clear()
+        match = resolve(path)
+        request = sync_response.wsgi_request
+        request.resolver_match = match
+        async_response = getattr(async_views, view)(request, **match.kwargs)
+        return sync_response, async_response
+
+    def test_pages_match_sync_views(self):
+        """Async view отдают те же страницы, что и обычные"""
+        pages = {
+            '/': 'index',
+            '/group/group/': 'group_posts',
+            '/profile/author/': 'profile',
+            f'/posts/{self.post.pk}/': 'post_detail',
+            '/follow/': 'follow_index',
+        }
+        for path, view in pages.items():
+            with self.subTest(path=path):
+                sync_response, async_response = self.get(path, view)
+                self.assertEqual(async_response.status_code, 200)
+                for text in ('Текст', 'Комментарий', 'Отписаться'):
+                    self.assertEqual(text in sync_response.content.decode(),
+                                     text in async_response.content.decode())
+
+    def test_unknown_group(self):
+        """Несуществующая группа — 404"""
+        request = self.client.get('/').wsgi_request
+        request.resolver_match = resolve('/group/none/')
+        with self.assertRaises(Http404):
+            async_views.group_posts(request, slug='none')
+
+    def test_queries_counted_for_request(self):
+        """Запросы view попадают в счётчики запроса"""
+        request = self.client.get('/').wsgi_request
+        request.resolver_match = resolve('/profile/author/')
+        with instrumentation.collect() as stats:
+            async_views.profile(request, username='author')
+        self.assertGreater(stats.queries, 0)
+
+
+def reload_urls():
+    # Выбор view чтения зависит от ASYNC_VIEWS при импорте urls.
+    importlib.reload(urls)
+    importlib.reload(root_urls)
+    clear_url_caches()
+
+
+class AsgiParallelTest(TransactionTestCase):
+    # Запросы view в пуле идут в других соединениях, поэтому данные
+    # должны быть закоммичены, а БД — в файле.
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Текст поста', author=author)
+        with override_settings(ASYNC_VIEWS=True):
+            reload_urls()
+        self.addCleanup(reload_urls)
+
+    def get(self, path):
+        from yatube.asgi import application
+
+        async def request():
+            communicator = ApplicationCommunicator(application, {
+                'type': 'http', 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'root_path': '',
+                'query_string': b'', 'headers': [(b'host', b'testserver')],
+                'server': ('testserver', 80), 'client': ('192.0.2.1', 1)})
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = b''
+            while True:
+                message = await communicator.receive_output(5)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body.decode()
+        return async_to_sync(request)()
+
+    def test_queries_run_in_pool(self):
+        """Под yatube.asgi запросы async view выполняются в пуле"""
+        self.assertTrue(asyncviews.parallel())
+        threads = []
+        call = asyncviews._call
+
+        def record(*args):
+            threads.append(threading.current_thread().name)
+            return call(*args)
+
+        with mock.patch.object(asyncviews, '_call', side_effect=record):
+            status, body = self.get('/profile/author/')
+        self.assertEqual(status, 200)
+        self.assertIn('Текст поста', body)
+        self.assertGreaterEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('async-views')
+                            for name in threads))
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_queries_from_pool_recorded(self):
+        """Медленные запросы из пула записываются после ответа"""
+        status, _ = self.get('/profile/author/')
+        self.assertEqual(status, 200)
+        # Посты автора под ASGI выбираются только в потоках пула.
+        self.assertTrue(SlowQuery.objects.filter(
+            view='posts:profile', sql__contains='FROM "posts_post"').exists())
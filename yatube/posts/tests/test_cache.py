@@ -1,9 +1,12 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
-from ..models import Post
+from .. import cards
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -34,3 +37,79 @@ class CacheTest(TestCase):
             reverse('posts:index'))
         self.assertNotEqual(response_after_clear_cache.content,
                             response_after_post.content)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Тестовый пост {i}',
+                                author=cls.author,
+                                group=cls.group)
+            for i in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_cached_cards_are_not_rendered_again(self):
+        """Страница с закешированными карточками не рендерит их заново"""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        with mock.patch('posts.cards.get_template') as get_template:
+            self.client.get(url)
+            get_template.assert_not_called()
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        with mock.patch('posts.cards.get_template',
+                        wraps=cards.get_template) as get_template:
+            response = self.client.get(url)
+            get_template.assert_called_once()
+        self.assertContains(response, 'Изменённый пост')
+        self.assertContains(response, 'Тестовый пост 1')
+
+    def test_author_name_change_invalidates_cards(self):
+        """Изменение имени автора меняет его карточки"""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.assertContains(self.client.get(url), 'Лев')
+        self.author.first_name = 'Фёдор'
+        self.author.save()
+        self.assertContains(self.client.get(url), 'Фёдор')
+
+    def test_login_does_not_invalidate_cards(self):
+        """Вход автора не меняет версии его постов"""
+        versions = list(Post.objects.values_list('version', flat=True))
+        self.client.force_login(self.author)
+        self.assertEqual(
+            list(Post.objects.values_list('version', flat=True)), versions)
+
+    def test_version_kept_when_not_saved(self):
+        """Версия не растёт, если её нет в update_fields"""
+        post = Post.objects.get(pk=self.posts[0].pk)
+        version = post.version
+        post.text = 'Только текст'
+        post.save(update_fields=['text'])
+        self.assertEqual(post.version, version)
+        self.assertEqual(Post.objects.get(pk=post.pk).version, version)
+        post.save(update_fields=['text', 'version'])
+        self.assertEqual(Post.objects.get(pk=post.pk).version, version + 1)
+
+    def test_group_change_invalidates_cards(self):
+        """Изменение слага группы меняет ссылки в карточках"""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertContains(self.client.get(url), '/group/new-slug/')
@@ -0,0 +1,179 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core import pubsub
+from .. import events
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+def make_scope(path, headers=()):
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': b'', 'headers': list(headers)}
+
+
+class NewPostEventsTest(TransactionTestCase):
+    # ASGI-приложение ходит в базу из своего потока, поэтому данные
+    # должны быть закоммичены.
+
+    def setUp(self):
+        pubsub.reset()
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    async def open_stream(self, path, headers=()):
+        communicator = ApplicationCommunicator(
+            events.application, make_scope(path, headers))
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        return communicator, start
+
+    async def close_stream(self, communicator):
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+
+    def test_new_post_pushed_to_feeds(self):
+        """Новый пост приходит в общую ленту, ленту группы и подписки"""
+        self.client.force_login(self.reader)
+        cookie = (f'sessionid={self.client.session.session_key}').encode()
+
+        async def run():
+            streams = [
+                await self.open_stream('/events/index/'),
+                await self.open_stream('/events/group/group/'),
+                await self.open_stream('/events/follow/',
+                                       [(b'cookie', cookie)]),
+            ]
+            for communicator, start in streams:
+                self.assertEqual(start['status'], 200)
+                self.assertIn((b'content-type',
+                               b'text/event-stream; charset=utf-8'),
+                              start['headers'])
+                first = await communicator.receive_output(1)
+                self.assertEqual(first['body'], b'retry: 5000\n\n')
+            post = await sync_to_async(Post.objects.create)(
+                text='Новый', author=self.author, group=self.group)
+            for communicator, _ in streams:
+                message = await communicator.receive_output(1)
+                self.assertEqual(
+                    message['body'],
+                    b'id: %d\nevent: post\n'
+                    b'data: {"id":%d,"author":%d,"group":%d}\n\n'
+                    % (post.pk, post.pk, self.author.pk, self.group.pk))
+                await self.close_stream(communicator)
+
+        async_to_sync(run)()
+        self.assertEqual(pubsub.get_hub()._subscriptions, {})
+
+    def test_missed_posts_replayed(self):
+        """После переподключения досылаются посты после Last-Event-ID"""
+        first = Post.objects.create(text='Первый', author=self.author)
+        second = Post.objects.create(text='Второй', author=self.author)
+
+        async def run():
+            communicator, _ = await self.open_stream(
+                '/events/index/', [(b'last-event-id', str(first.pk).encode())])
+            body = (await communicator.receive_output(1))['body']
+            await self.close_stream(communicator)
+            return body
+
+        body = async_to_sync(run)()
+        self.assertIn(f'id: {second.pk}\n'.encode(), body)
+        self.assertNotIn(f'id: {first.pk}\n'.encode(), body)
+
+    def test_unknown_feeds(self):
+        """Чужие ленты и неизвестные группы не отдаются"""
+        async def status(path):
+            communicator, start = await self.open_stream(path)
+            await communicator.wait(1)
+            return start['status']
+
+        self.assertEqual(async_to_sync(status)('/events/follow/'), 403)
+        self.assertEqual(async_to_sync(status)('/events/group/none/'), 404)
+
+    def test_feed_pages_link_stream(self):
+        """Страницы лент подключают свой поток событий"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'data-events="/events/index/"')
+        response = self.client.get(reverse('posts:group_list',
+                                           args=('group',)))
+        self.assertContains(response, 'data-events="/events/group/group/"')
+        self.assertContains(response, 'data-cards="/cards/?show_group=0"')
+
+    def test_new_cards(self):
+        """По номерам из событий отдаются только карточки этих постов"""
+        old = Post.objects.create(text='Старый пост', author=self.author)
+        new = Post.objects.create(text='Новый пост', author=self.author,
+                                  group=self.group)
+        response = self.client.get(reverse('posts:new_cards'),
+                                   {'ids': f'{new.pk},x'})
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, self.group.slug)
+        self.assertNotContains(response, old.text)
+        response = self.client.get(reverse('posts:new_cards'),
+                                   {'ids': new.pk, 'show_group': '0'})
+        self.assertNotContains(response, self.group.slug)
+
+
+class CacheTransportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_messages_read_from_cache(self):
+        """Сообщения другого процесса читаются из кеша по номерам"""
+        transport = pubsub.CacheTransport()
+        received = []
+        transport.publish('posts', {'id': 1}, None)
+        transport.publish('posts', {'id': 2}, None)
+        last = transport.receive(1, lambda *args: received.append(args))
+        self.assertEqual(last, 2)
+        self.assertEqual(received, [('posts', {'id': 2})])
+        self.assertEqual(transport.receive(last, received.append), 2)
+
+    def test_unwritten_message_waited_for(self):
+        """Номер без записанного сообщения не пропускается сразу"""
+        transport = pubsub.CacheTransport(gap_timeout=60)
+        received = []
+        transport.publish('posts', {'id': 1}, None)
+        # Номер 2 выдан другому процессу, который ещё не записал сообщение.
+        cache.incr(transport.SEQUENCE_KEY)
+        transport.publish('posts', {'id': 3}, None)
+        last = transport.receive(0, lambda *args: received.append(args))
+        self.assertEqual(last, 1)
+        cache.set(transport._message_key(2), ('posts', {'id': 2}))
+        last = transport.receive(last, lambda *args: received.append(args))
+        self.assertEqual(last, 3)
+        self.assertEqual([message['id'] for _, message in received],
+                         [1, 2, 3])
+
+    def test_lost_message_skipped_after_gap_timeout(self):
+        """Так и не записанное сообщение пропускается через gap_timeout"""
+        transport = pubsub.CacheTransport(gap_timeout=0)
+        received = []
+        cache.add(transport.SEQUENCE_KEY, 0)
+        cache.incr(transport.SEQUENCE_KEY)
+        transport.publish('posts', {'id': 2}, None)
+        last = transport.receive(0, lambda *args: received.append(args))
+        self.assertEqual(last, 2)
+        self.assertEqual(received, [('posts', {'id': 2})])
+
+    def test_taken_number_not_overwritten(self):
+        """Занятый другим процессом номер не перезаписывается"""
+        transport = pubsub.CacheTransport(cache='pubsub')
+        transport.cache.clear()
+        transport.cache.set(transport._message_key(1), ('posts', {'id': 1}))
+        transport.publish('posts', {'id': 2}, None)
+        self.assertEqual(
+            transport.cache.get_many([transport._message_key(1),
+                                      transport._message_key(2)]),
+            {transport._message_key(1): ('posts', {'id': 1}),
+             transport._message_key(2): ('posts', {'id': 2})})
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -91,9 +92,12 @@ class PostCreateEditFormTest(TestCase):
                 text=form_data['text'],
                 author=self.user,
                 group_id=form_data['group'],
-                image=f'posts/{form_data["image"].name}'
             ).exists()
         )
+        # Картинка хранится под хешем своего содержимого.
+        digest = hashlib.sha256(posts[0].image.read()).hexdigest()
+        self.assertEqual(posts[0].image.name,
+                         f'posts/{digest[:2]}/{digest}.gif')
 
     def test_post_edit_form(self):
         """
@@ -0,0 +1,309 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core import page_cache
+from core.models import StoredFile
+from core.thumbnail import thumbnail_file
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(name='photo.jpg', size=(400, 200), orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    if orientation is not None:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, output.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=300)
+class PostImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_normalize(self):
+        """Оригинал повёрнут по EXIF, уменьшен и без метаданных"""
+        normalized = images.normalize(make_upload(orientation=6))
+        image = Image.open(normalized)
+        self.assertEqual(image.size, (150, 300))
+        self.assertEqual((normalized.width, normalized.height), (150, 300))
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(normalized.name, 'photo.jpg')
+
+    def test_other_formats_saved_as_jpeg(self):
+        """Форматы не для веба пересохраняются в JPEG"""
+        output = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(output, 'BMP')
+        upload = SimpleUploadedFile('scan.bmp', output.getvalue())
+        self.assertEqual(images.normalize(upload).name, 'scan.jpg')
+
+    def truncated_upload(self):
+        """JPEG с целым заголовком, но обрезанными данными."""
+        return SimpleUploadedFile('broken.jpg', make_upload().read()[:800],
+                                  content_type='image/jpeg')
+
+    def test_truncated_image_rejected_by_form(self):
+        """Битая картинка — ошибка формы, а не 500"""
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Битая', 'image': self.truncated_upload()})
+        self.assertFormError(response, 'form', 'image',
+                             'Загрузите правильное изображение')
+        self.assertFalse(Post.objects.filter(text='Битая').exists())
+
+    def test_truncated_image_rejected_by_api(self):
+        """Битая картинка через API — ответ 400"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/posts/', {
+            'text': 'Битая', 'image': self.truncated_upload(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+        self.assertFalse(Post.objects.filter(text='Битая').exists())
+
+    def test_form_upload_creates_variants(self):
+        """Загрузка через форму сохраняет размеры и варианты"""
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'С картинкой', 'image': make_upload()})
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (300, 150))
+        for size in ((480, 170), (960, 339), (1440, 508)):
+            for extension in ('.jpg', '.webp'):
+                name = images.variant_name(post.image.name, size, extension)
+                with self.subTest(size=size, extension=extension):
+                    self.assertTrue(default_storage.exists(name))
+                    with default_storage.open(name) as variant:
+                        self.assertEqual(Image.open(variant).size, size)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=(post.pk,)))
+        image = images.responsive([post])[post.pk]
+        self.assertIn('_1440x508.webp 1440w', image.webp_srcset)
+        self.assertContains(response, image.webp_srcset)
+        self.assertContains(response, f'srcset="{image.srcset}"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertTrue(post.image_placeholder.startswith(
+            'data:image/webp;base64,'))
+        self.assertLess(len(post.image_placeholder), 400)
+        self.assertEqual(post.image_color, '#fe0000')
+        self.assertContains(response, f'url({post.image_placeholder})')
+
+    @override_settings(UPLOAD_MAX_BYTES=500)
+    def test_upload_size_limit(self):
+        """Слишком большой файл не сохраняется, форма сообщает об ошибке"""
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Большой', 'image': make_upload()})
+        self.assertFormError(response, 'form', 'image',
+                             'Файл больше 500\xa0байт')
+        self.assertFalse(Post.objects.filter(text='Большой').exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_pixel_limit_checked_before_decoding(self):
+        """Размер картинки проверяется по заголовку"""
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Огромный', 'image': make_upload()})
+        self.assertFormError(response, 'form', 'image',
+                             'Картинка больше 1000 пикселей')
+
+    def test_backfill_placeholders(self):
+        """Команда заполняет превью старых загрузок и меняет версию"""
+        post = Post.objects.create(text='Старый', author=self.user,
+                                   image=make_upload('legacy.jpg'))
+        self.assertEqual(post.image_placeholder, '')
+        Post.objects.get_cached(pk=post.pk)
+        out = io.StringIO()
+        call_command('backfill_image_placeholders', stdout=out)
+        self.assertIn('Заполнено: 1', out.getvalue())
+        cached = Post.objects.get_cached(pk=post.pk)
+        self.assertTrue(cached.image_placeholder.startswith('data:'))
+        self.assertEqual(cached.version, post.version + 1)
+
+    def test_backfill_invalidates_page_cache(self):
+        """После заполнения превью кеш страниц сбрасывается один раз"""
+        Post.objects.create(text='Старый', author=self.user,
+                            image=make_upload('legacy.jpg'))
+        generation = page_cache.generation()
+        with mock.patch.object(page_cache, 'invalidate',
+                               wraps=page_cache.invalidate) as invalidate:
+            call_command('backfill_image_placeholders',
+                         stdout=io.StringIO())
+            self.assertEqual(invalidate.call_count, 1)
+            call_command('backfill_image_placeholders',
+                         stdout=io.StringIO())
+            self.assertEqual(invalidate.call_count, 1)
+        self.assertNotEqual(page_cache.generation(), generation)
+
+    def test_thumbnail_name_matches_sorl(self):
+        """Имя миниатюры то же, под которым её ищет sorl-thumbnail"""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=make_upload('legacy.png'))
+        for preserve_format in (False, True):
+            with self.subTest(preserve_format=preserve_format), \
+                    override_settings(
+                        THUMBNAIL_PRESERVE_FORMAT=preserve_format):
+                thumbnail = thumbnail_file(post.image, '480x170',
+                                           crop='center')
+                thumbnail.set_size((480, 170))
+                default.kvstore.set(thumbnail)
+                # Найденная в KV-хранилище миниатюра не создаётся заново.
+                self.assertEqual(
+                    get_thumbnail(post.image, '480x170', crop='center').name,
+                    thumbnail.name)
+
+    def test_original_when_no_thumbnail(self):
+        """Без миниатюры в карточке показывается оригинал"""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=make_upload('broken.jpg'))
+        with mock.patch('posts.images.responsive', return_value={}):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+
+    def test_legacy_thumbnails_batched(self):
+        """Миниатюры старых загрузок всех постов ищутся одним запросом"""
+        posts = [Post.objects.create(text=f'Старый пост {i}',
+                                     author=self.user,
+                                     image=make_upload(f'old{i}.jpg'))
+                 for i in range(3)]
+        self.assertIsNone(posts[0].image_width)
+        # Миниатюры уже созданы: достаточно записей в KV-хранилище.
+        for post in posts:
+            for width in (480, 960, 1440):
+                size = images.scaled((960, 339), width)
+                thumbnail = thumbnail_file(post.image, '{}x{}'.format(*size),
+                                           crop='center', upscale=True)
+                thumbnail.set_size(size)
+                default.kvstore.set(thumbnail)
+        cache.clear()
+        with self.assertNumQueries(1):
+            found = images.responsive(posts)
+        with self.assertNumQueries(0):
+            self.assertEqual(images.responsive(posts), found)
+        image = found[posts[0].pk]
+        self.assertIsNone(image.webp_srcset)
+        self.assertEqual(image.srcset.count('w, '), 2)
+        self.assertIn('1440w', image.srcset)
+
+    def test_api_upload_normalized(self):
+        """Загрузка через API проходит ту же обработку"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/posts/', {
+            'text': 'Из API', 'image': make_upload(size=(600, 600)),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['image_width'],
+                          response.data['image_height']), (300, 300))
+        post = Post.objects.get(text='Из API')
+        self.assertTrue(os.path.exists(post.image.path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeduplicatedStorageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+
+    def create_post(self, upload):
+        return Post.objects.create(text='Пост', author=self.user,
+                                   image=images.normalize(upload))
+
+    def test_release_deletes_thumbnails(self):
+        """С последней ссылкой на картинку удаляются её миниатюры"""
+        post = self.create_post(make_upload())
+        # Как после get_thumbnail: исходник и миниатюра в KV-хранилище.
+        source = ImageFile(post.image)
+        source.set_size((post.image_width, post.image_height))
+        default.kvstore.set(source)
+        thumbnail = thumbnail_file(post.image, '480x170')
+        thumbnail.set_size((480, 170))
+        default.storage.save(thumbnail.name, io.BytesIO(b'thumbnail'))
+        default.kvstore.set(thumbnail, source)
+        post.delete()
+        self.assertFalse(default.storage.exists(thumbnail.name))
+        self.assertIsNone(default.kvstore.get(thumbnail))
+
+    def test_identical_uploads_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом до последней ссылки"""
+        first = self.create_post(make_upload('first.jpg'))
+        second = self.create_post(make_upload('second.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        name = first.image.name
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        self.assertEqual(
+            thumbnail_file(first.image, '480x170').name,
+            thumbnail_file(Post.objects.get(pk=second.pk).image,
+                           '480x170').name)
+        variant = images.variant_name(name, (480, 170), '.webp')
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_save_takes_reference(self):
+        """Сохранение берёт ссылку, и release() другой ссылки не удалит файл"""
+        post = self.create_post(make_upload('first.jpg'))
+        name = post.image.name
+        upload = images.normalize(make_upload('copy.jpg'))
+        storage = post.image.storage
+        saved = storage.save(
+            post.image.field.generate_filename(post, upload.name), upload)
+        self.assertEqual(saved, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        storage.release(name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    def test_replaced_image_released(self):
+        """Заменённая картинка без других ссылок удаляется"""
+        post = self.create_post(make_upload('old.jpg'))
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = images.normalize(make_upload('new.jpg', size=(50, 50)))
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(post.image.name))
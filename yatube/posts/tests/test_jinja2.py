@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+JINJA2_VIEWS = {
+    'posts:index': 'jinja2',
+    'posts:group_list': 'jinja2',
+    'posts:profile': 'jinja2',
+    'posts:follow_index': 'jinja2',
+}
+
+
+@override_settings(VIEW_TEMPLATE_ENGINES=JINJA2_VIEWS)
+class Jinja2FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев',
+                                              last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_feed_pages_match_django_templates(self):
+        """Страницы Jinja2 содержат те же ссылки и тексты, что и Django"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author,)),
+            reverse('posts:follow_index'),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                jinja2_content = self.client.get(page).content.decode()
+                cache.clear()
+                with self.settings(VIEW_TEMPLATE_ENGINES={}):
+                    django_content = self.client.get(page).content.decode()
+                cache.clear()
+                for fragment in (
+                        self.post.text,
+                        reverse('posts:post_detail', args=(self.post.pk,)),
+                        'Пользователь: user'):
+                    self.assertIn(fragment, jinja2_content)
+                    self.assertIn(fragment, django_content)
+
+    def test_index_fragment_cache(self):
+        """{% cache %} в Jinja2 кеширует ленту главной страницы"""
+        response_before_post = self.client.get(reverse('posts:index'))
+        Post.objects.create(text='Новый пост', author=self.author)
+        response_after_post = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Новый пост', response_after_post.content.decode())
+        self.assertEqual(response_before_post.content,
+                         response_after_post.content)
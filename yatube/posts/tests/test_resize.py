@@ -0,0 +1,103 @@
+import io
+import os
+import shutil
+import tempfile
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.utils.html import escape
+from PIL import Image
+
+from .. import resize
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   IMAGE_RESIZE_CACHE_DIR=TEMP_CACHE_DIR)
+class ResizedImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        output = io.BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(output, 'JPEG')
+        storage = Post._meta.get_field('image').storage
+        with override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT):
+            cls.name = storage.save('posts/photo.jpg',
+                                    ContentFile(output.getvalue()))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def get_image(self, response):
+        return Image.open(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_resized_image(self):
+        """Картинка уменьшается с сохранением пропорций и кешируется"""
+        url = resize.url(self.name, 100)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertEqual(self.get_image(response).size, (100, 50))
+        params = resize.from_query(
+            self.name, dict(parse_qsl(urlsplit(url).query)))
+        self.assertTrue(os.path.exists(resize.cache_path(params)))
+        response.close()
+
+    def test_crop_and_format(self):
+        """С обрезкой размер точный, формат задаётся параметром"""
+        response = self.client.get(
+            resize.url(self.name, 50, 50, crop=True, format='webp'))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        image = self.get_image(response)
+        self.assertEqual((image.format, image.size), ('WEBP', (50, 50)))
+        response.close()
+
+    def test_bad_signature(self):
+        """Изменённые параметры без новой подписи не принимаются"""
+        url = resize.url(self.name, 100).replace('w=100', 'w=200')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_missing_original(self):
+        """Адрес без оригинала в хранилище даёт 404"""
+        response = self.client.get(resize.url('posts/missing.jpg', 100))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304"""
+        url = resize.url(self.name, 80)
+        response = self.client.get(url)
+        response.close()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_template_tag(self):
+        """Тег строит тот же подписанный адрес"""
+        rendered = Template(
+            '{% load post_images %}{% resized_url name 100 %}'
+        ).render(Context({'name': self.name}))
+        self.assertEqual(rendered, escape(resize.url(self.name, 100)))
+
+    def test_evict_least_recently_used(self):
+        """При превышении предела удаляются давно не запрошенные файлы"""
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+        directory = os.path.join(TEMP_CACHE_DIR, 'ev')
+        os.makedirs(directory)
+        paths = [os.path.join(directory, f'{index}.jpg')
+                 for index in range(3)]
+        for index, path in enumerate(paths):
+            with open(path, 'wb') as cached_file:
+                cached_file.write(b'x' * 100)
+            os.utime(path, (1000 + index, 1000 + index))
+        self.assertEqual(resize.evict(max_bytes=250), 200)
+        self.assertEqual([os.path.exists(path) for path in paths],
+                         [False, True, True])
@@ -1,24 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = 'posts'
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
-    path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('group/<slug:slug>/', read_views.group_posts,
+         name='group_list'),
+    path('profile/<str:username>/', read_views.profile, name='profile'),
+    path('posts/<int:post_id>/', read_views.post_detail,
+         name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
-    path('follow/', views.follow_index, name='follow_index'),
+    path('follow/', read_views.follow_index, name='follow_index'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/',
          views.profile_unfollow,
          name='profile_unfollow'),
-    path('', views.index, name='index')
+    path('cards/', views.new_cards, name='new_cards'),
+    path('images/<path:name>', views.resized_image, name='resized_image'),
+    path('', read_views.index, name='index')
 ]
@@ -2,6 +2,10 @@ from django.core.paginator import Paginator
 
 from django.conf import settings
 
+from core import page_cache
+from core.coalesce import get_or_compute
+from .models import Post
+
 
 def paginator(request, obj_list):
     """Разбивает obj_list по страницам"""
@@ -9,3 +13,20 @@ def paginator(request, obj_list):
     page_number = request.GET.get('page')
     page_obj = paginator_obj.get_page(page_number)
     return page_obj
+
+
+def template_engine(request):
+    """Шаблонизатор текущей view из VIEW_TEMPLATE_ENGINES"""
+    view_name = request.resolver_match.view_name
+    return settings.VIEW_TEMPLATE_ENGINES.get(view_name)
+
+
+def author_posts_count(author):
+    """Число постов автора; кеш сбрасывается с изменением контента"""
+    key = f'posts-count:{author.pk}:{page_cache.generation()}'
+    return get_or_compute(
+        key,
+        lambda: Post.objects.filter(author=author).count(),
+        settings.POSTS_COUNT_CACHE_TIMEOUT,
+        name='posts_count',
+    )
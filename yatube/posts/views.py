@@ -1,39 +1,59 @@
+from concurrent.futures import TimeoutError
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404, redirect, render
+from django.core.signing import BadSignature
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_safe
+
+from core.object_cache import get_cached_or_404
 
+from . import cards, events, images, resize
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Comment, Follow
-from .utils import paginator
+from .models import Group, Post, Comment, Follow, cached_users
+from .utils import author_posts_count, paginator, template_engine
 
 User = get_user_model()
 
 
+def first_page_events(page_obj, feed, *args):
+    """Поток новых постов нужен только на первой странице ленты."""
+    if page_obj.number != 1:
+        return None
+    return events.feed_url(feed, *args)
+
+
 def index(request):
-    post_list = Post.objects.select_related('group').all()
+    post_list = Post.objects.select_related('group').cached()
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'index'),
     }
-    return render(request, 'posts/index.html', context)
+    return render(request, 'posts/index.html', context,
+                  using=template_engine(request))
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
+    group = get_cached_or_404(Group.objects, slug=slug)
+    posts_list = group.posts.cached()
     page_obj = paginator(request, posts_list)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'group', group.slug),
     }
-    return render(request, 'posts/group_list.html', context)
+    return render(request, 'posts/group_list.html', context,
+                  using=template_engine(request))
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(cached_users, username=username)
     posts_list = Post.objects.filter(
-        author=author).select_related('group')
-    posts_count = posts_list.count()
+        author=author).select_related('group').cached()
+    posts_count = author_posts_count(author)
     page_obj = paginator(request, posts_list)
     context = {
         'page_obj': page_obj,
@@ -41,24 +61,27 @@ def profile(request, username):
         'posts_count': posts_count,
     }
     if not request.user.is_authenticated:
-        return render(request, 'posts/profile.html', context)
+        return render(request, 'posts/profile.html', context,
+                      using=template_engine(request))
     following = Follow.objects.filter(
         user=request.user,
         author=author
-    )
+    ).cached()
     context['following'] = following
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/profile.html', context,
+                  using=template_engine(request))
 
 
 def post_detail(request, post_id):
     user = request.user
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = Post.objects.filter(author=post.author).count()
+    post = get_cached_or_404(Post.objects, pk=post_id)
+    posts_count = author_posts_count(post.author)
     comments = Comment.objects.filter(post_id=post_id)
     form = CommentForm(request.POST or None)
     context = {
         'posts_count': posts_count,
         'post': post,
+        'image': images.responsive([post]).get(post.pk),
         'user': user,
         'form': form,
         'comments': comments
@@ -82,7 +105,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_cached_or_404(Post.objects, pk=post_id)
     if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
     is_edit = True
@@ -101,7 +124,7 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_cached_or_404(Post.objects, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -116,17 +139,20 @@ def follow_index(request):
     follower_user = request.user
     user_following_authors = Follow.objects.filter(
         user=follower_user).values('author')
-    posts = Post.objects.filter(author__in=user_following_authors)
+    posts = Post.objects.filter(
+        author__in=user_following_authors).cached()
     page_obj = paginator(request, posts)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'events_url': first_page_events(page_obj, 'follow'),
     }
-    return render(request, 'posts/follow.html', context)
+    return render(request, 'posts/follow.html', context,
+                  using=template_engine(request))
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(cached_users, username=username)
     if author == request.user:
         return redirect('posts:profile', username=username)
     Follow.objects.get_or_create(
@@ -138,9 +164,48 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(cached_users, username=username)
     Follow.objects.filter(
         user=request.user,
         author=author
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+@require_safe
+def new_cards(request):
+    """Карточки новых постов из событий ленты, ids через запятую"""
+    ids = [int(post_id) for post_id in request.GET.get('ids', '').split(',')
+           if post_id.isdigit()][:settings.SSE_REPLAY_LIMIT]
+    posts = Post.objects.filter(pk__in=ids).select_related('author', 'group')
+    html = cards.render_cards(
+        posts, 'django', show_group=request.GET.get('show_group') != '0')
+    return HttpResponse('\n<hr>\n'.join(html))
+
+
+@require_safe
+def resized_image(request, name):
+    try:
+        params = resize.from_query(name, request.GET)
+    except (ValueError, BadSignature):
+        raise Http404
+    etag = f'"{resize.cache_key(params)}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponse(status=304)
+    else:
+        try:
+            image_file = resize.open_resized(params)
+        except TimeoutError:
+            response = HttpResponse(status=503)
+            response['Retry-After'] = 1
+            return response
+        except OSError:
+            # Оригинала нет или это не картинка.
+            raise Http404
+        # Файл отдаётся через wsgi.file_wrapper, то есть sendfile сервера.
+        response = FileResponse(image_file,
+                                content_type=resize.content_type(params))
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f'public, max-age={settings.IMAGE_RESIZE_MAX_AGE}, immutable')
+    return response
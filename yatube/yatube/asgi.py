@@ -0,0 +1,84 @@
+"""
+ASGI config for yatube project.
+
+Потоки событий лент (SSE_URL) обслуживаются асинхронно, остальные
+запросы передаются WSGI-приложению Django в пуле потоков (размер задаёт
+ASGI_THREADS). View чтения работают в async-версиях (ASYNC_VIEWS).
+"""
+
+import os
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
+
+class ThreadedWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # В asgiref WSGI-приложение по умолчанию вызывается в одном общем
+    # потоке, то есть запросы шли бы строго по очереди.
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self.handle, thread_sensitive=False)(body)
+
+    def handle(self, body):
+        """Выполняет WSGI-приложение и отправляет ответ по частям."""
+        environ = self.build_environ(self.scope, body)
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            bytes_sent = 0
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                if self.response_content_length is not None:
+                    output = output[
+                        :self.response_content_length - bytes_sent]
+                self.sync_send({'type': 'http.response.body',
+                                'body': output, 'more_body': True})
+                bytes_sent += len(output)
+                if bytes_sent == self.response_content_length:
+                    break
+        finally:
+            # Django шлёт request_finished и закрывает файлы в close().
+            close = getattr(response, 'close', None)
+            if close is not None:
+                close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiToAsgiInstance(self.wsgi_application)(
+            scope, receive, send)
+
+
+django_application = ThreadedWsgiToAsgi(get_wsgi_application())
+
+from django.conf import settings  # noqa: E402
+
+from posts import events  # noqa: E402
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif (scope['type'] == 'http'
+            and scope['path'].startswith(settings.SSE_URL)):
+        await events.application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -16,6 +16,160 @@ ALLOWED_HOSTS = ['127.0.0.1',
 
 POSTS_PER_PAGE = 10
 
+# Срок хранения отрендеренных карточек постов, с
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Срок хранения числа постов автора, с
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 5
+# Срок хранения объектов Post, Group и User в кеше объектов, с
+OBJECT_CACHE_TIMEOUT = 60 * 10
+# Таблицы, запись в которые меняет их версию в кеше результатов запросов.
+# Запросы к другим таблицам через cached() не кешируются.
+QUERY_CACHE_TABLES = (
+    'posts_post',
+    'posts_comment',
+    'posts_follow',
+    'posts_group',
+    'auth_user',
+)
+# Срок хранения результатов запросов по умолчанию, с
+QUERY_CACHE_TIMEOUT = 60 * 10
+
+# Защита пересчётов кеша: сколько отдавать устаревшее значение после
+# срока, сколько ждать чужого пересчёта и как часто проверять кеш, с
+CACHE_STALE_TTL = 60
+CACHE_FILL_LOCK_TIMEOUT = 10
+CACHE_FILL_POLL_INTERVAL = 0.05
+
+# Страницы, которые целиком кешируются для анонимов, и срок хранения, с
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Режим деградации: view, для которых при перегрузке БД отдаётся
+# последний удачный ответ, и параметры предохранителя БД
+DEGRADATION_VIEWS = PAGE_CACHE_VIEWS + (
+    'posts:follow_index',
+    'api:post-list',
+    'api:post-detail',
+    'api:group-list',
+    'api:group-detail',
+    'api:comments-list',
+    'api:comments-detail',
+)
+STALE_RESPONSE_TIMEOUT = 60 * 60
+DB_BREAKER_FAILURE_THRESHOLD = 5
+DB_BREAKER_SLOW_QUERY = 1
+DB_BREAKER_COOLDOWN = 10
+
+# Контроль допуска: одновременно выполняемые запросы, длина очереди
+# и время ожидания в ней, с, для каждого класса маршрутов; priority_queue —
+# отдельная очередь записей вошедших пользователей
+ADMISSION_CLASSES = {
+    'feeds': {'limit': 8, 'queue': 16, 'timeout': 2},
+    'writes': {'limit': 4, 'queue': 16, 'priority_queue': 8, 'timeout': 5},
+    'api': {'limit': 8, 'queue': 16, 'timeout': 2},
+    'static': {'limit': 4, 'queue': 8, 'timeout': 1},
+}
+ADMISSION_FEED_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:new_cards',
+)
+ADMISSION_EXEMPT_VIEWS = ('health', 'metrics')
+ADMISSION_RETRY_AFTER = 1
+
+# События о новых постах (ASGI, yatube.asgi): адрес потоков, пауза
+# переподключения клиента, мс, период пустых комментариев, с, и сколько
+# пропущенных постов досылается после переподключения.
+SSE_URL = '/events/'
+SSE_RETRY = 5000
+SSE_HEARTBEAT = 15
+SSE_REPLAY_LIMIT = 50
+
+# Доставка событий между процессами. core.pubsub.LocalTransport — только
+# в своём процессе: годится, когда сайт и потоки событий отдаёт один
+# процесс yatube.asgi. Если процессов несколько (WEB_CONCURRENCY > 1 или
+# посты создают отдельные WSGI-процессы), нужен core.pubsub.CacheTransport
+# через кеш 'pubsub' в БД, общий для всех процессов; его таблицу создаёт
+# manage.py createcachetable.
+PUBSUB_TRANSPORT = os.environ.get(
+    'PUBSUB_TRANSPORT',
+    'core.pubsub.CacheTransport'
+    if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1
+    else 'core.pubsub.LocalTransport')
+PUBSUB_OPTIONS = (
+    {'cache': 'pubsub'}
+    if PUBSUB_TRANSPORT == 'core.pubsub.CacheTransport' else {})
+
+# Async-версии view чтения (posts.async_views); включаются в yatube.asgi.
+# Их независимые запросы к БД идут в пуле из ASYNC_VIEWS_WORKERS потоков.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+ASYNC_VIEWS_WORKERS = 16
+
+# Сжатие ответов: включение, наименьшее тело, байт, сжимаемые типы
+# и уровни gzip и brotli для ответов, которые сжимаются на лету.
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/xml',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Счётчики запросов к БД, кешу, шаблонам и миниатюрам в Server-Timing
+INSTRUMENTATION_ENABLED = True
+
+# Каталог для файлов метрик процессов; None — метрики только в памяти.
+# Перед стартом воркеров очищается командой clear_metrics
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Токен для сборщика Prometheus: Authorization: Bearer <токен>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Профили запросов: доля случайной выборки и период снятия стека, с
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_SAMPLE_RATE = 0
+PROFILING_INTERVAL = 0.005
+
+# Прогрев кешей: view, обращения к которым учитываются, и адреса,
+# прогреваемые всегда, помимо WARMUP_TOP самых популярных.
+WARMUP_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'api:post-list',
+    'api:group-list',
+)
+WARMUP_PATHS = ('/', '/api/v1/posts/', '/api/v1/groups/')
+WARMUP_TOP = 20
+WARMUP_WORKERS = 4
+# Прогрев в фоне при запуске WSGI-процесса
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP') == '1'
+WARMUP_HOST = 'localhost'
+# Статистика обращений: каталог (None — не собирается), период записи, с,
+# и доля, с которой счётчики прошлых запусков переходят в новую сводку.
+WARMUP_STATS_DIR = os.environ.get('WARMUP_STATS_DIR')
+WARMUP_STATS_FLUSH_INTERVAL = 60
+WARMUP_STATS_DECAY = 0.5
+
+# Порог медленного запроса к БД, с; None отключает журнал
+SLOW_QUERY_THRESHOLD = 0.1
+
+THUMBNAIL_KVSTORE = 'core.thumbnail.KVStore'
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 LOGOUT_REDIRECT_URL = 'posts:index'
@@ -28,6 +182,44 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся на диск по частям; файлы больше UPLOAD_MAX_BYTES
+# отклоняются, не дочитываясь.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedUploadHandler']
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+
+# Загрузка картинок частями через API: каталог частей, наибольшая часть,
+# байт, и срок хранения незавершённой загрузки, с.
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
+CHUNKED_UPLOAD_MAX_CHUNK = 5 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Картинки постов: наибольшая сторона оригинала и превью-заглушки, px,
+# качество JPEG и WebP и варианты, которые выводят шаблоны: основной размер, ширины для srcset
+# (среди них должна быть основная) и атрибут sizes.
+POST_IMAGE_MAX_SIZE = 2560
+POST_IMAGE_PLACEHOLDER_SIZE = 16
+# Наибольшее число пикселей загружаемой картинки: больше не декодируется.
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_WEBP_QUALITY = 80
+POST_IMAGE_VARIANTS = {
+    'card': {
+        'size': (960, 339),
+        'widths': (480, 960, 1440),
+        'sizes': '(max-width: 767px) 100vw, 720px',
+    },
+}
+
+# Картинки постов по подписанному адресу: наибольшая сторона, px, каталог
+# и предел дискового кеша, байт, потоки и время ожидания генерации, с,
+# и срок хранения в кешах браузеров и CDN, с.
+IMAGE_RESIZE_MAX_SIZE = 2560
+IMAGE_RESIZE_CACHE_DIR = os.path.join(BASE_DIR, 'image_cache')
+IMAGE_RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+IMAGE_RESIZE_WORKERS = 2
+IMAGE_RESIZE_TIMEOUT = 30
+IMAGE_RESIZE_MAX_AGE = 365 * 24 * 60 * 60
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -50,14 +242,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.instrumentation.InstrumentationMiddleware',
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.slow_queries.SlowQueryMiddleware',
+    'core.middleware.warmup.AccessStatsMiddleware',
+    'core.middleware.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.page_cache.AnonymousPageCacheMiddleware',
+    'core.middleware.degradation.DegradationMiddleware',
+    'core.middleware.admission.AdmissionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -69,10 +270,11 @@ ROOT_URLCONF = 'yatube.urls'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+JINJA2_DIR = os.path.join(BASE_DIR, 'jinja2')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,15 +287,49 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        'BACKEND': 'core.backends.jinja2.Jinja2',
+        'DIRS': [JINJA2_DIR],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'core.backends.jinja2.environment',
+            'context_processors': [
+                'django.contrib.auth.context_processors.auth',
+                'core.context_processors.year.year'
+            ],
+        },
+    },
 ]
 
+# Шаблонизатор для отдельных view, например {'posts:index': 'jinja2'};
+# для остальных используется Django
+VIEW_TEMPLATE_ENGINES = {}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.LocMemCache',
+        'OPTIONS': {
+            # Карточки постов (по несколько на пост), страницы, объекты
+            # и миниатюры: при 300 записях по умолчанию кеш вытеснялся
+            # бы постоянно.
+            'MAX_ENTRIES': 10000,
+            # Значения длиннее min_length байт хранятся сжатыми zlib.
+            'CODEC': 'core.codecs.ZlibCodec',
+            'CODEC_OPTIONS': {'min_length': 1024},
+        },
+    },
+    # События pub/sub между процессами (PUBSUB_TRANSPORT); сроки
+    # сообщений задаёт сам транспорт.
+    'pubsub': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'pubsub_cache',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
 
 # Database
 
@@ -101,6 +337,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, '../db.sqlite3'),
+        # Тестовая БД в файле, а не в памяти: иначе async view не
+        # выполняют запросы одновременно (core.asyncviews.parallel).
+        'TEST': {'NAME': os.path.join(BASE_DIR, '../test_db.sqlite3')},
     }
 }
 
@@ -136,6 +375,32 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Сжатые копии статики при collectstatic: расширения и наименьший
+# размер файла, байт.
+STATIC_COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.json',
+                              '.txt', '.xml', '.map', '.html')
+STATIC_COMPRESS_MIN_SIZE = 256
+
+# Статика и медиафайлы через Python: включение и срок хранения в кешах
+# браузеров, с, для статики с хешем в имени, без него, для медиафайлов
+# с именем по хешу содержимого и для остальных.
+SERVE_STATIC = True
+SERVE_MEDIA = True
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_UNHASHED_MAX_AGE = 60 * 60
+MEDIA_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_UNHASHED_MAX_AGE = 60 * 60
+
+# Передача файлов веб-серверу: None, 'x-sendfile' или 'x-accel-redirect',
+# и внутренние location nginx для X-Accel-Redirect.
+SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND')
+SENDFILE_LOCATIONS = {
+    'static': '/internal/static/',
+    'media': '/internal/media/',
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -144,8 +409,29 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserRateThrottle',
+        'api.throttling.IPRateThrottle',
+        'api.throttling.EndpointClassRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '300/min',
+        'ip': '600/min',
+        'read': '300/min',
+        'write': '60/min',
+        'uploads': '600/min',
+    },
+    # Число доверенных прокси перед приложением: IP клиента для
+    # ограничений берётся из X-Forwarded-For только за ними, а при 0 —
+    # из REMOTE_ADDR, и клиент не может подменить его заголовком.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# Кеш с корзинами ограничения частоты запросов к API.
+RATE_LIMIT_CACHE = 'default'
+# Сколько корзин держит хранилище в памяти процесса до очистки полных.
+RATE_LIMIT_LOCAL_MAX_KEYS = 10000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -1,9 +1,13 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.views.generic import TemplateView
 
+from core.serving import media_file, static_file
+from core.views import health, metrics
+
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
 handler500 = 'core.views.server_error'
@@ -16,14 +20,22 @@ urlpatterns = [
     path('redoc/', TemplateView.as_view(template_name='api/redoc.html'),
          name='redoc'),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
+    path('health/', health, name='health'),
     path('', include('posts.urls', namespace='posts')),
 ]
 
+if settings.SERVE_STATIC:
+    urlpatterns.append(re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')),
+        static_file, name='static'))
+
+if settings.SERVE_MEDIA:
+    urlpatterns.append(re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        media_file, name='media'))
+
 if settings.DEBUG:
     import debug_toolbar
 
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
-
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)